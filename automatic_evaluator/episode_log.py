@@ -0,0 +1,135 @@
+"""Columnar binary episode logs.
+
+A log is a sequence of episode records, appended as the episodes finish:
+
+    header (magic, metadata size, payload size) | metadata (json) | payload (zlib)
+
+The metadata holds the agent path, the number of steps, the dtype of every column, the episode
+totals and any extra scalar keys of the episode (game, seed, ...). The payload holds the typed
+step columns (float32 rewards, float32 step times, uint8 actions) compressed together. Appending
+an episode only writes its own record, and the index of a log is read from the headers and the
+metadata without decompressing any payload, so selecting the episodes of one agent only decodes
+those episodes.
+"""
+import json
+import struct
+import zlib
+
+import numpy as np
+
+
+LOG_SUFFIX = ".hlog"
+
+_MAGIC = b"HAEL"
+_HEADER = struct.Struct("<4sII")
+
+# Step columns of an episode and their dtype in the log
+COLUMNS = {
+    "current_episodes_rewards": np.float32,
+    "current_episodes_times": np.float32,
+    "current_episodes_actions": np.uint8,
+}
+# Metadata keys added by the log, not part of the logged episode
+_INDEX_KEYS = ("dtypes", "steps", "reward_sum", "time_sum", "offset", "payload_size")
+
+
+def _action_dtype(actions):
+    """uint8 for the usual discrete actions, int64 otherwise"""
+    if len(actions) == 0 or (min(actions) >= 0 and max(actions) <= 255):
+        return np.uint8
+    return np.int64
+
+
+def append_episode(log_file, episode_data):
+    """appends an episode at the end of a binary log
+
+    Args:
+        log_file (str): path of the log file
+        episode_data (dict): episode values, as logged by eval.log_episode_data
+    """
+    columns = []
+    meta = {key: value for key, value in episode_data.items() if key not in COLUMNS}
+    meta["dtypes"] = {}
+    for name, dtype in COLUMNS.items():
+        values = episode_data[name]
+        if name == "current_episodes_actions":
+            dtype = _action_dtype(values)
+        column = np.asarray(values, dtype=dtype)
+        meta["dtypes"][name] = column.dtype.str
+        columns.append(column.tobytes())
+    meta["steps"] = len(episode_data["current_episodes_rewards"])
+    meta["reward_sum"] = float(np.sum(episode_data["current_episodes_rewards"], dtype=np.float64))
+    meta["time_sum"] = float(np.sum(episode_data["current_episodes_times"], dtype=np.float64))
+
+    meta_bytes = json.dumps(meta).encode()
+    payload = zlib.compress(b"".join(columns))
+    with open(log_file, "ab") as f:
+        f.write(_HEADER.pack(_MAGIC, len(meta_bytes), len(payload)))
+        f.write(meta_bytes)
+        f.write(payload)
+
+
+def read_index(log_file):
+    """reads the metadata of every episode of a binary log, without decoding the steps
+
+    A truncated record at the end of the file (an episode being written) is ignored.
+
+    Args:
+        log_file (str): path of the log file
+
+    Returns:
+        list: metadata dictionary of every episode, with the position of its payload
+    """
+    index = []
+    with open(log_file, "rb") as f:
+        size = f.seek(0, 2)
+        f.seek(0)
+        while True:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                break
+            magic, meta_size, payload_size = _HEADER.unpack(header)
+            if magic != _MAGIC:
+                raise ValueError(f"{log_file} is not a binary episode log")
+            meta_bytes = f.read(meta_size)
+            offset = f.tell()
+            if len(meta_bytes) < meta_size or offset + payload_size > size:
+                break
+            f.seek(payload_size, 1)
+            meta = json.loads(meta_bytes)
+            meta["offset"] = offset
+            meta["payload_size"] = payload_size
+            index.append(meta)
+    return index
+
+
+def read_episodes(log_file, agent_path=None, index=None, as_arrays=False):
+    """reads the episodes of a binary log
+
+    Args:
+        log_file (str): path of the log file
+        agent_path (str): only read the episodes of this agent
+        index (list): index of the log, read from the file if None
+        as_arrays (bool): return the step columns as numpy arrays instead of lists
+
+    Returns:
+        list: list of dictionaries where each dictionary is an episode_data
+    """
+    if index is None:
+        index = read_index(log_file)
+    episodes = []
+    with open(log_file, "rb") as f:
+        for meta in index:
+            if agent_path is not None and meta.get("agent_path") != agent_path:
+                continue
+            f.seek(meta["offset"])
+            payload = memoryview(zlib.decompress(f.read(meta["payload_size"])))
+            episode_data = {key: value for key, value in meta.items() if key not in _INDEX_KEYS}
+            start = 0
+            for name in COLUMNS:
+                dtype = np.dtype(meta["dtypes"][name])
+                column = np.frombuffer(payload, dtype=dtype, count=meta["steps"], offset=start)
+                start += column.nbytes
+                episode_data[name] = column if as_arrays else column.tolist()
+            episodes.append(episode_data)
+    return episodes
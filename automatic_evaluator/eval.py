@@ -2,9 +2,12 @@ import numpy as np
 import json
 import gzip
 import shutil
+from pathlib import Path
 from typing import Literal, List, Dict
 
+from hackatari.metrics import EvaluationMetrics, print_metrics as print_evaluation_metrics
 from log_data import LogData
+import episode_log
 
 # numpy warnings undiresable in ui output
 import warnings
@@ -12,12 +15,15 @@ warnings.filterwarnings('ignore')
 
 
 def log_episode_data(log_file, episode_data):
-    """appends new episode data at the end of the log json
+    """appends new episode data at the end of the log (binary for .hlog files, json otherwise)
 
     Args:
         log_file (str): path of the log file
         episode_data (dict): episode values
     """
+    if log_file.endswith(episode_log.LOG_SUFFIX):
+        episode_log.append_episode(log_file, episode_data)
+        return
     with open(log_file, 'a') as f:
         json.dump(episode_data, f)
         f.write('\n')
@@ -42,16 +48,21 @@ def decompress_log_data(compressed_file, decompressed_file):
     with gzip.open(compressed_file, 'rb') as f_in, open(decompressed_file, 'wb') as f_out:
         shutil.copyfileobj(f_in, f_out)
 
-def read_log_data(log_file):
+def read_log_data(log_file, agent_path=None):
     """Reads log file into python list
 
     Args:
         log_file (str): path of the log file
+        agent_path (str): only read the episodes of this agent
 
     Returns:
         list: list of dictionaries where each dictionary is an episode_data
     """
+    if log_file.endswith(episode_log.LOG_SUFFIX):
+        return episode_log.read_episodes(log_file, agent_path)
     with open(log_file, 'r') as f:
+        if agent_path is not None:
+            return [episode for episode in map(json.loads, f) if episode["agent_path"] == agent_path]
         return [json.loads(line) for line in f]
 
 def combine_means_and_stds(mu_list, sigma_list, n_list):
@@ -80,98 +91,20 @@ def combine_means_and_stds(mu_list, sigma_list, n_list):
     return combined_mean, combined_std
 
 def print_metrics(episode_data, args_episodes):
-    """prints metrics from a log file's content
+    """prints metrics from a log file's content, in one pass over the episodes
 
     Args:
-        episode_data (dict): episode values
+        episode_data (iterable | EvaluationMetrics): episode values, or the metrics aggregated while
+            the evaluation ran
         args_episodes (int): number of episodes each evaluation is ran
     """
-    unique_agents = list({episode["agent_path"]: None for episode in episode_data}.keys()) # this preserves the agent path order
-    episode_data_grouped_by_agent = [[episode for episode in episode_data if episode["agent_path"] == agent] for agent in unique_agents]
-
-    all_episodes_avg_rewards = []
-    all_episodes_std_rewards = []
-    all_episodes_avg_times = []
-    all_episodes_std_times = []
-    all_episodes_avg_steps = []
-    all_episodes_std_steps = []
-    total_runs = []
-
-    for unique_agent, agent_group in zip(unique_agents, episode_data_grouped_by_agent):
-        print(f"Loaded agent from {unique_agent}")
-        
-        all_episodes_cumulative_rewards = []
-        all_episodes_cumulative_times = []
-        all_episodes_cumulative_actions = []
-        all_episodes_cumulative_steps = []
-
-        for episode, episode_data in enumerate(agent_group):
-            agent_path = episode_data["agent_path"]
-            current_episodes_rewards = episode_data["current_episodes_rewards"]
-            current_episodes_times = episode_data["current_episodes_times"]
-            current_episodes_actions = episode_data["current_episodes_actions"]
-
-            episodes_cumulative_reward = sum(current_episodes_rewards)            
-            all_episodes_cumulative_rewards.append(episodes_cumulative_reward)
-            
-            episodes_cumulative_time = sum(current_episodes_times)
-            all_episodes_cumulative_times.append(episodes_cumulative_time)
-
-            episodes_cumulative_action = {ac:current_episodes_actions.count(ac) for ac in current_episodes_actions}
-            episodes_cumulative_action = dict(sorted(episodes_cumulative_action.items()))
-            all_episodes_cumulative_actions.append(episodes_cumulative_action)
-
-            episodes_cumulative_step = len(current_episodes_times)
-            all_episodes_cumulative_steps.append(episodes_cumulative_step)
-
-            print(f"Episode {episode + 1}: Reward = {episodes_cumulative_reward}, Time = {episodes_cumulative_time:.2f} seconds with {episodes_cumulative_step} steps and actions: {episodes_cumulative_action}")
-
-        all_episodes_avg_reward = np.mean(all_episodes_cumulative_rewards)
-        all_episodes_std_reward = np.std(all_episodes_cumulative_rewards)
-        all_episodes_avg_rewards.append(all_episodes_avg_reward)
-        all_episodes_std_rewards.append(all_episodes_std_reward)
-
-        all_episodes_avg_time = np.mean(all_episodes_cumulative_times)
-        all_episodes_std_time = np.std(all_episodes_cumulative_times)
-        all_episodes_avg_times.append(all_episodes_avg_time)
-        all_episodes_std_times.append(all_episodes_std_time)
-
-        all_episodes_avg_step = np.mean(all_episodes_cumulative_steps)
-        all_episodes_std_step = np.std(all_episodes_cumulative_steps)
-        all_episodes_avg_steps.append(all_episodes_avg_step)
-        all_episodes_std_steps.append(all_episodes_std_step)
-
-        total_runs.append(args_episodes)
-
-        print("\nSummary:")
-        print(f"Agent: {agent_path}")
-        print(f"Total Episodes: {args_episodes}")
-
-        print(f"Average Reward: {all_episodes_avg_reward:.2f}")
-        print(f"Reward Standard Deviation: {all_episodes_std_reward:.2f}")
-        print(f"Min Reward: {np.min(all_episodes_cumulative_rewards)}")
-        print(f"Max Reward: {np.max(all_episodes_cumulative_rewards)}")
-
-        print(f"Average Time: {all_episodes_avg_time:.2f} seconds")
-        print(f"Time Standard Deviation: {all_episodes_std_time:.2f} seconds")
-        print(f"Min Time: {np.min(all_episodes_cumulative_times):.2f} seconds")
-        print(f"Max Step: {np.max(all_episodes_cumulative_times):.2f} seconds")
-
-        print(f"Average Step: {all_episodes_avg_step:.2f} steps")
-        print(f"Step Standard Deviation: {all_episodes_std_step:.2f} steps")
-        print(f"Min Step: {np.min(all_episodes_cumulative_steps)} steps")
-        print(f"Max Step: {np.max(all_episodes_cumulative_steps)} steps")
-
-        print("--------------------------------------")
-
-    # Compute overall statistics
-    total_avg, total_std = combine_means_and_stds(all_episodes_avg_rewards, all_episodes_std_rewards, total_runs)
-    total_avg_time, total_std_time = combine_means_and_stds(all_episodes_avg_times, all_episodes_std_times, total_runs)
-    total_avg_step, total_std_step = combine_means_and_stds(all_episodes_avg_steps, all_episodes_std_steps, total_runs)
-    print("------------------------------------------------")
-    print(f"Overall Average Reward: {total_avg:.2f}, Time: {total_avg_time:.2f} seconds and {total_avg_step:.2f} steps")
-    print(f"Overall Reward Standard Deviation: {total_std:.2f}, Time Standard Deviation: {total_std_time:.2f} seconds, Step Standard Deviation: {total_std_step:.2f}")
-    print("------------------------------------------------")
+    if isinstance(episode_data, EvaluationMetrics):
+        metrics = episode_data
+    else:
+        metrics = EvaluationMetrics()
+        for episode in episode_data:
+            metrics.add_episode(episode)
+    print_evaluation_metrics(metrics, args_episodes)
 
 def get_log_data(episode_data, data_type: Literal["time", "action", "reward"]):
     """returns wanted measurement type from the log
@@ -230,11 +163,17 @@ def process_logs(logs: List[Dict], selected_game: str, model_path) -> List[LogDa
     return processed
 
 def load_logs(log_infos: List[Dict]):
+    """Reads the logs of evaluation runs, binary (.hlog) logs are read in place and the older
+    gzipped json logs are decompressed next to them first"""
     logs = []
     for log_info in log_infos:
         log_name = log_info["log_name"]
-        decompress_log_data(log_name.replace(".json", ".gz"), log_name)
-        log = read_log_data(log_name)    
+        binary_log = log_name[:-len(".json")] + episode_log.LOG_SUFFIX if log_name.endswith(".json") else log_name
+        if Path(binary_log).exists():
+            log = read_log_data(binary_log)
+        else:
+            decompress_log_data(log_name.replace(".json", ".gz"), log_name)
+            log = read_log_data(log_name)
         logs.append({"log": log, "modifications": log_info["modifications"], "game": log_info["game"], "model": log_info["model"]})
 
     return logs
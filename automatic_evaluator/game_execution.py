@@ -2,11 +2,14 @@ from hackatari import HackAtari
 import numpy as np
 import torch
 from ocatari.utils import load_agent
+from functools import partial
 import os
 
 import time
 
+from hackatari.metrics import EvaluationMetrics
 import eval
+import episode_log
 
 # Disable graphics window (SDL) for headless execution
 os.environ["SDL_VIDEODRIVER"] = "dummy"
@@ -38,6 +41,153 @@ def combine_means_and_stds(mu_list, sigma_list, n_list):
     return combined_mean, combined_std
 
 
+def run_episode(env, policy, obs):
+    """
+    Plays one episode with the given policy, from a freshly reset env.
+
+    Args:
+        env (HackAtari): environment, reset by the caller
+        policy (callable): policy returned by ocatari.utils.load_agent
+        obs: observation returned by the reset
+
+    Returns:
+        dict: step rewards, step times and actions of the episode, in the log format
+    """
+    done = False
+    current_episodes_rewards = []
+    current_episodes_times = []
+    current_episodes_actions = []
+
+    while not done:
+        step_start_time = time.time()
+
+        action = policy(torch.Tensor(obs).unsqueeze(0))[0]
+
+        # make compatible with obj model
+        action = action.tolist() if isinstance(action, torch.Tensor) else action
+
+        obs, reward, terminated, truncated, _ = env.step(action)
+        current_episodes_rewards.append(reward)
+        done = terminated or truncated
+
+        step_end_time = time.time()
+        current_episodes_times.append(step_end_time - step_start_time)
+
+        current_episodes_actions.append(action)
+
+    return {
+        "current_episodes_rewards": current_episodes_rewards,
+        "current_episodes_times": current_episodes_times,
+        "current_episodes_actions": current_episodes_actions
+    }
+
+
+def batched_policy(agent, policy):
+    """
+    Returns a version of a policy that takes a (K, ...) batch of observations and returns K actions.
+
+    The batch goes through the agent returned by ocatari.utils.load_agent: the dqn agents
+    (AtariNet, wrapped in an epsilon-greedy partial drawing a single action) get their
+    epsilon-greedy choice redone per row, the cleanrl agents draw the actions of the whole batch
+    with draw_action. Any other policy is called once per row, as in run_episode.
+
+    Args:
+        agent: agent returned by ocatari.utils.load_agent
+        policy (callable): policy returned by ocatari.utils.load_agent
+
+    Returns:
+        callable: batched policy, returning a list of actions
+    """
+    if isinstance(policy, partial) and policy.keywords.get("model") is agent:
+        eps = policy.keywords.get("eps", 0.001)
+
+        def epsilon_greedy(obs):
+            actions = agent(obs.byte()).argmax(1)
+            explore = torch.rand(len(obs)) < eps
+            if explore.any():
+                actions[explore] = torch.randint(agent.action_no, (int(explore.sum()),))
+            return actions.tolist()
+        return epsilon_greedy
+
+    if isinstance(agent, torch.nn.Module) and hasattr(agent, "draw_action"):
+        def draw_actions(obs):
+            return agent.draw_action(obs).tolist()
+        return draw_actions
+
+    def draw_actions_per_row(obs):
+        actions = []
+        for row in obs:
+            action = policy(row.unsqueeze(0))[0]
+            actions.append(action.tolist() if isinstance(action, torch.Tensor) else action)
+        return actions
+    return draw_actions_per_row
+
+
+def run_episodes_batched(envs, agent, policy, episodes, device="cpu"):
+    """
+    Plays episodes on K environments in lockstep, with one forward pass of the policy per step.
+
+    The observations of the running environments are copied into the first rows of a reusable
+    (K, ...) buffer (pinned if the policy runs on cuda). An environment whose episode ends starts
+    the next remaining episode, or leaves the batch once all episodes are started. The step time of
+    an environment is its env.step time plus its share of the forward pass.
+
+    Args:
+        envs (list): K environments of the same configuration
+        agent: agent returned by ocatari.utils.load_agent
+        policy (callable): policy returned by ocatari.utils.load_agent
+        episodes (int): total number of episodes to play
+        device (str): device of the policy
+
+    Returns:
+        list: one dict per episode in the format of run_episode, in the order the episodes started
+    """
+    draw_actions = batched_policy(agent, policy)
+    results = [None] * episodes
+    lanes = []  # (env, episode index, observation, episode data) of the running environments
+    for env, episode in zip(envs, range(episodes)):
+        obs, _ = env.reset()
+        lanes.append([env, episode, obs, {"current_episodes_rewards": [],
+                                          "current_episodes_times": [],
+                                          "current_episodes_actions": []}])
+    next_episode = len(lanes)
+    buffer = torch.empty((len(lanes), *np.shape(lanes[0][2])), dtype=torch.float32,
+                         pin_memory=device != "cpu" and torch.cuda.is_available())
+    buffer_view = buffer.numpy()
+
+    while lanes:
+        forward_start_time = time.time()
+        for row, lane in enumerate(lanes):
+            buffer_view[row] = lane[2]
+        batch = buffer[:len(lanes)].to(device, non_blocking=True)
+        with torch.no_grad():
+            actions = draw_actions(batch)
+        forward_time = (time.time() - forward_start_time) / len(lanes)
+
+        running = []
+        for lane, action in zip(lanes, actions):
+            env, episode, _, episode_data = lane
+            step_start_time = time.time()
+            obs, reward, terminated, truncated, _ = env.step(action)
+            episode_data["current_episodes_rewards"].append(reward)
+            episode_data["current_episodes_times"].append(
+                forward_time + time.time() - step_start_time)
+            episode_data["current_episodes_actions"].append(action)
+            lane[2] = obs
+            if not (terminated or truncated):
+                running.append(lane)
+                continue
+            results[episode] = episode_data
+            if next_episode < episodes:
+                obs, _ = env.reset()
+                running.append([env, next_episode, obs, {"current_episodes_rewards": [],
+                                                         "current_episodes_times": [],
+                                                         "current_episodes_actions": []}])
+                next_episode += 1
+        lanes = running
+    return results
+
+
 def eval_run(game='pong',
         agents = [],
         modifications = [],
@@ -56,13 +206,15 @@ def eval_run(game='pong',
         full_action_space = False,
         episodes = 1,
         log_file = 'logs.json',
+        batch_size = 1,
     ):
-    """Main function to run HackAtari experiments with different agents."""
+    """Main function to run HackAtari experiments with different agents.
+
+    With batch_size > 1, the episodes of an agent are played on batch_size environments in
+    lockstep and the policy is called once per step on all of them (see run_episodes_batched).
+    """
     # Initialize environment
-    env = HackAtari(
-        game,
-        modifications,
-        rewardfunc_path,
+    env_kwargs = dict(
         dopamine_pooling=dopamine_pooling,
         game_mode=game_mode,
         difficulty=difficulty,
@@ -76,6 +228,9 @@ def eval_run(game='pong',
         repeat_action_probability=repeat_action_probability,
         full_action_space=full_action_space,
     )
+    envs = [HackAtari(game, modifications, rewardfunc_path, **env_kwargs)
+            for _ in range(max(1, min(batch_size, episodes)))]
+    env = envs[0]
 
     env_params = f"game:{game}, "
     env_params += f"modifications:{modifications}, "
@@ -104,48 +259,28 @@ def eval_run(game='pong',
         return
 
 
-    compressed_file = log_file + ".gz"
-    log_file = log_file + ".json"
+    # episodes are written to a binary log next to the requested json path (see episode_log)
+    log_file = log_file + episode_log.LOG_SUFFIX
+    metrics = EvaluationMetrics()
     # Iterate through all agent models
     for agent_path in agents:
         agent, policy = load_agent(agent_path, env, "cpu")
         
         print(f"Running for episodes: {episodes}")
+        if len(envs) > 1:
+            for episode_data in run_episodes_batched(envs, agent, policy, episodes):
+                episode_data = {"agent_path": agent_path, **episode_data}
+                eval.log_episode_data(log_file, episode_data)
+                metrics.add_episode(episode_data)
+            continue
         for episode in range(episodes):
             obs, _ = env.reset()
-            done = False
-            current_episodes_rewards = []
-            current_episodes_times = []
-            current_episodes_actions = []
-            
-            while not done:
-                step_start_time = time.time()
-
-                action = policy(torch.Tensor(obs).unsqueeze(0))[0]
-                
-                # make compatible with obj model
-                action = action.tolist() if isinstance(action, torch.Tensor) else action
-                
-                obs, reward, terminated, truncated, _ = env.step(action)
-                current_episodes_rewards.append(reward)
-                done = terminated or truncated
-
-                step_end_time = time.time()
-                current_episodes_times.append(step_end_time - step_start_time)
-                
-                current_episodes_actions.append(action)
-
-            episode_data = {
-                "agent_path": agent_path,
-                "current_episodes_rewards": current_episodes_rewards,
-                "current_episodes_times": current_episodes_times,
-                "current_episodes_actions": current_episodes_actions
-            }
+            episode_data = run_episode(env, policy, obs)
+            episode_data = {"agent_path": agent_path, **episode_data}
             eval.log_episode_data(log_file, episode_data)
+            metrics.add_episode(episode_data)
 
-    env.close()
+    for env in envs:
+        env.close()
 
-    episode_data = eval.read_log_data(log_file)
-    eval.print_metrics(episode_data, episodes)
-    eval.compress_log_data(log_file, compressed_file)
-    os.remove(log_file)
+    eval.print_metrics(metrics, episodes)
@@ -0,0 +1,235 @@
+import argparse
+import gzip
+import itertools
+import json
+import multiprocessing as mp
+import os
+import random
+import time
+from pathlib import Path
+
+import numpy as np
+from hackatari import HackAtari
+from hackatari.metrics import EvaluationMetrics
+from ocatari.utils import load_agent
+
+import episode_log
+import eval
+import game_execution
+
+# Disable graphics window (SDL) for headless execution
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+
+
+# State of a worker process: the env and the agent of the last episode, reused by the next one
+_worker = {"env_kwargs": None, "env_key": None, "env": None, "agent_key": None, "policy": None}
+
+
+def make_jobs(games, modification_sets, agents, seeds, episodes):
+    """
+    Expands an evaluation grid into one job per episode.
+
+    Args:
+        games (list): game names
+        modification_sets (list): lists of modifications, [] for the unmodified game
+        agents (list): agent paths
+        seeds (list): seeds, every seed runs `episodes` episodes
+        episodes (int): number of episodes per (game, modifications, agent, seed)
+
+    Returns:
+        list: job dictionaries
+    """
+    jobs = []
+    for game, modifications, agent_path, seed in itertools.product(
+            games, modification_sets, agents, seeds):
+        for episode in range(episodes):
+            jobs.append({
+                "game": game,
+                "modifications": list(modifications),
+                "agent_path": agent_path,
+                "seed": seed,
+                "episode": episode,
+            })
+    return jobs
+
+
+def episode_seed(seed, episode):
+    """Independent reset seed of an episode, derived from the run seed and the episode index."""
+    return int(np.random.SeedSequence([seed, episode]).generate_state(1)[0])
+
+
+def _config_key(job):
+    return job["game"], tuple(job["modifications"])
+
+
+def expected_steps_from_logs(log_files):
+    """
+    Estimates the episode lengths from previous scheduler logs (.hlog, .json or .gz). Binary logs
+    are estimated from their index, without decoding the episodes.
+
+    Args:
+        log_files (list): paths of previous logs
+
+    Returns:
+        dict: (game, modifications tuple, agent path) -> mean number of steps
+    """
+    lengths = {}
+    for log_file in log_files:
+        if str(log_file).endswith(episode_log.LOG_SUFFIX):
+            for meta in episode_log.read_index(log_file):
+                if "game" in meta:
+                    key = (meta["game"], tuple(meta["modifications"]), meta["agent_path"])
+                    lengths.setdefault(key, []).append(meta["steps"])
+            continue
+        opener = gzip.open if str(log_file).endswith(".gz") else open
+        with opener(log_file, "rt") as f:
+            for line in f:
+                episode_data = json.loads(line)
+                if "game" not in episode_data:
+                    continue
+                key = (episode_data["game"], tuple(episode_data["modifications"]),
+                       episode_data["agent_path"])
+                lengths.setdefault(key, []).append(len(episode_data["current_episodes_times"]))
+    return {key: float(np.mean(values)) for key, values in lengths.items()}
+
+
+def schedule(jobs, expected_steps=None):
+    """
+    Orders the jobs longest expected episode first (LPT scheduling), so that the long episodes
+    do not end up alone at the tail of the run. Jobs of equal length are grouped by configuration
+    and agent, so that workers can reuse their env and agent.
+
+    Args:
+        jobs (list): job dictionaries
+        expected_steps (dict): (game, modifications tuple, agent path) -> expected episode length,
+            jobs without an estimate keep their grid order
+
+    Returns:
+        list: the ordered jobs
+    """
+    expected_steps = expected_steps or {}
+
+    def length(job):
+        return expected_steps.get(_config_key(job) + (job["agent_path"],), 0.0)
+
+    return sorted(jobs, key=lambda job: (-length(job), _config_key(job), job["agent_path"]))
+
+
+def _init_worker(env_kwargs):
+    _worker["env_kwargs"] = env_kwargs
+
+
+def _run_job(job):
+    """Runs one episode in a worker, reusing the env and the agent of the previous job if possible."""
+    env_key = _config_key(job)
+    if _worker["env_key"] != env_key:
+        if _worker["env"] is not None:
+            _worker["env"].close()
+        _worker["env"] = HackAtari(job["game"], job["modifications"], **_worker["env_kwargs"])
+        _worker["env_key"] = env_key
+        _worker["agent_key"] = None
+    env = _worker["env"]
+    if _worker["agent_key"] != job["agent_path"]:
+        _, _worker["policy"] = load_agent(job["agent_path"], env, "cpu")
+        _worker["agent_key"] = job["agent_path"]
+
+    seed = episode_seed(job["seed"], job["episode"])
+    random.seed(seed)
+    obs, _ = env.reset(seed=seed)
+    episode_data = game_execution.run_episode(env, _worker["policy"], obs)
+    return {**job, **episode_data}
+
+
+def _log_name(log_dir, tag, game, modifications):
+    mods = "_".join(modifications) if modifications else "none"
+    return str(Path(log_dir) / f"logs_{tag}_{game}_{mods}{episode_log.LOG_SUFFIX}")
+
+
+def run_grid(games, modification_sets, agents, seeds=(0,), episodes=1, workers=None,
+             log_dir=".", expected_steps=None, env_kwargs=None):
+    """
+    Evaluates every agent on every (game, modifications) pair, spreading the episodes over a
+    process pool. Each worker keeps one env and one loaded agent, finished episodes are appended
+    to the log of their (game, modifications) as they arrive.
+
+    Args:
+        games (list): game names
+        modification_sets (list): lists of modifications, [] for the unmodified game
+        agents (list): agent paths
+        seeds (list): seeds of the runs
+        episodes (int): episodes per (game, modifications, agent, seed)
+        workers (int): number of worker processes, all cores if None
+        log_dir (str): directory of the logs
+        expected_steps (dict): expected episode lengths, see expected_steps_from_logs
+        env_kwargs (dict): keyword arguments of the HackAtari environments
+
+    Returns:
+        list: log infos (log_name, modifications, game, model) of the binary logs, as read by
+            eval.load_logs
+    """
+    env_kwargs = {"obs_mode": "dqn", "render_mode": None, **(env_kwargs or {})}
+    jobs = schedule(make_jobs(games, modification_sets, agents, seeds, episodes), expected_steps)
+    tag = time.strftime("%Y%m%d%H%M%S")
+    log_infos = {}
+    for game, modifications in itertools.product(games, modification_sets):
+        log_infos[(game, tuple(modifications))] = {
+            "log_name": _log_name(log_dir, tag, game, modifications),
+            "modifications": list(modifications),
+            "game": game,
+            "model": list(agents),
+        }
+    metrics = {key: EvaluationMetrics() for key in log_infos}
+
+    print(f"Running {len(jobs)} episodes on {workers or os.cpu_count()} workers")
+    start = time.time()
+    with mp.Pool(workers, initializer=_init_worker, initargs=(env_kwargs,)) as pool:
+        for done, episode_data in enumerate(pool.imap_unordered(_run_job, jobs), 1):
+            key = _config_key(episode_data)
+            eval.log_episode_data(log_infos[key]["log_name"], episode_data)
+            metrics[key].add_episode(episode_data)
+            print(f"[{done}/{len(jobs)}] {episode_data['game']} {episode_data['modifications']} "
+                  f"{episode_data['agent_path']} seed {episode_data['seed']} "
+                  f"episode {episode_data['episode']}: "
+                  f"reward {sum(episode_data['current_episodes_rewards'])}, "
+                  f"{len(episode_data['current_episodes_times'])} steps "
+                  f"({time.time() - start:.0f}s)")
+
+    for key, info in log_infos.items():
+        if not metrics[key].agents:
+            continue
+        print(f"\n{info['game']} with modifications {info['modifications']}")
+        eval.print_metrics(metrics[key], episodes * len(seeds))
+    return list(log_infos.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel HackAtari evaluation of a grid of runs")
+    parser.add_argument("-g", "--games", nargs="+", required=True, help="Games to evaluate")
+    parser.add_argument("-m", "--modifications", nargs="+", default=["none"],
+                        help="Modification sets, comma separated ('none' for the original game)")
+    parser.add_argument("-a", "--agents", nargs="+", required=True, help="Paths to the agents")
+    parser.add_argument("-s", "--seeds", nargs="+", type=int, default=[0], help="Seeds")
+    parser.add_argument("-e", "--episodes", type=int, default=1,
+                        help="Episodes per game, modification set, agent and seed")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="Number of worker processes (default: all cores)")
+    parser.add_argument("-l", "--log_dir", type=str, default=".", help="Directory of the logs")
+    parser.add_argument("-p", "--previous_logs", nargs="*", default=[],
+                        help="Previous logs used to estimate the episode lengths")
+    parser.add_argument("-obs", "--obs_mode", type=str, default="dqn",
+                        help="The observation mode (ori, dqn, obj)")
+    parser.add_argument("-f", "--frameskip", type=int, default=4,
+                        help="Frames skipped after each action + 1 (default = 4)")
+    parser.add_argument("-dp", "--dopamine_pooling", action="store_true",
+                        help="Use dopamine-like frameskipping")
+    args = parser.parse_args()
+
+    modification_sets = [[] if mods == "none" else mods.split(",") for mods in args.modifications]
+    run_grid(args.games, modification_sets, args.agents, args.seeds, args.episodes,
+             args.workers, args.log_dir, expected_steps_from_logs(args.previous_logs),
+             {"obs_mode": args.obs_mode, "frameskip": args.frameskip,
+              "dopamine_pooling": args.dopamine_pooling})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+import io
+import json
+import os
+import struct
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Fields of the objects array, one row per object slot of a sample
+OBJECT_DTYPE = np.dtype(
+    [
+        ("category", np.int16),  # index in the "object_categories" of the metadata, -1 if empty
+        ("x", np.int16),
+        ("y", np.int16),
+        ("w", np.int16),
+        ("h", np.int16),
+        ("rgb", np.uint8, (3,)),
+    ]
+)
+
+
+def _npy_header(dtype, shape, length=None):
+    """
+    Header of a .npy file (format 1.0), padded with spaces to ``length`` bytes if given.
+    """
+    buffer = io.BytesIO()
+    np.lib.format.write_array_header_1_0(buffer, {
+        "descr": np.lib.format.dtype_to_descr(dtype),
+        "fortran_order": False,
+        "shape": shape,
+    })
+    header = buffer.getvalue()
+    if length is None or len(header) == length:
+        return header
+    text = header[10:-1].ljust(length - 11) + b"\n"
+    return header[:8] + struct.pack("<H", len(text)) + text
+
+
+class _ColumnFile:
+    """
+    A .npy file of up to ``frames`` rows, allocated when opened and filled row after row. Closing
+    it trims the array to the rows that were written.
+    """
+
+    def __init__(self, path, dtype, shape, frames):
+        self.dtype = np.dtype(dtype)
+        self.shape = tuple(shape)
+        self.rows = 0
+        self.file = open(path, "wb")
+        self.header_size = self.file.write(_npy_header(self.dtype, (frames, *self.shape)))
+        self.row_size = self.dtype.itemsize * int(np.prod(self.shape))
+        # Sparse until written: the space of the rows is only used as they are appended
+        self.file.truncate(self.header_size + frames * self.row_size)
+
+    def append(self, value):
+        row = np.asarray(value, dtype=self.dtype)
+        if row.shape != self.shape:
+            raise ValueError(f"Expected a row of shape {self.shape}, got {row.shape}")
+        self.append_bytes(row.tobytes())
+
+    def append_bytes(self, data):
+        self.file.write(data)
+        self.rows += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.seek(0)
+        self.file.write(_npy_header(self.dtype, (self.rows, *self.shape), self.header_size))
+        self.file.truncate(self.header_size + self.rows * self.row_size)
+        self.file.close()
+
+
+class _FrameStore:
+    """
+    Frames of one kind (RGB screens or grayscale DQN frames), each stored once in a .npy file and
+    referenced by its row. A frame identical to one of the last ``window`` frames is not stored
+    again, which removes the overlap of consecutive observations and frame stacks.
+    """
+
+    def __init__(self, path, shape, capacity, window):
+        self.file = _ColumnFile(path, np.uint8, shape, capacity)
+        self.window = window
+        self.recent = OrderedDict()
+
+    def put(self, frame):
+        """
+        Stores a frame if needed and returns its row.
+        """
+        frame = np.asarray(frame, dtype=np.uint8)
+        if frame.shape != self.file.shape:
+            raise ValueError(f"Expected a frame of shape {self.file.shape}, got {frame.shape}")
+        key = frame.tobytes()
+        index = self.recent.get(key)
+        if index is None:
+            index = self.file.rows
+            self.file.append_bytes(key)
+            self.recent[key] = index
+            if len(self.recent) > self.window:
+                self.recent.popitem(last=False)
+        else:
+            self.recent.move_to_end(key)
+        return index
+
+
+class DatasetWriter:
+    """
+    Streams the samples of a dataset into .npy files, one file per column.
+
+    Every emulator frame is stored once: the RGB screens in ``rgb_frames.npy`` and the grayscale
+    84x84 frames in ``gray_frames.npy``. The ``obs``/``next_obs`` columns hold the row of their
+    screen and the ``obs_dqn``/``next_obs_dqn`` columns the rows of the frames of their stack.
+    ``load_dataset`` rebuilds the observations on access.
+
+    All the files are allocated on disk for ``frames`` samples when the writer is created, every
+    sample is appended to the files as it is drawn, and ``close`` trims the files to what was
+    written and writes the metadata. Nothing is kept in memory but the last few frames, so the
+    memory used is the same for any number of frames. The objects of a sample are stored in a
+    structured array of ``max_objects`` slots (see ``OBJECT_DTYPE``).
+    """
+
+    # Observation columns -> frame store holding their frames
+    FRAME_COLUMNS = {
+        "obs": "rgb_frames",
+        "next_obs": "rgb_frames",
+        "obs_dqn": "gray_frames",
+        "next_obs_dqn": "gray_frames",
+    }
+
+    def __init__(self, path, frames, rgb_shape=(210, 160, 3), dqn_shape=(4, 84, 84),
+                 max_objects=64, flush_every=1000):
+        self.path = path
+        self.frames = frames
+        self.max_objects = max_objects
+        self.flush_every = flush_every
+        os.makedirs(path, exist_ok=True)
+        stack = dqn_shape[0]
+        self.frame_stores = {
+            "rgb_frames": _FrameStore(os.path.join(path, "rgb_frames.npy"), rgb_shape,
+                                      2 * frames, window=4),
+            "gray_frames": _FrameStore(os.path.join(path, "gray_frames.npy"), dqn_shape[1:],
+                                       2 * stack * frames, window=2 * stack),
+        }
+        self.columns = {}
+        for name, dtype, shape in [
+            ("index", "U11", ()),
+            ("obs", np.int64, ()),
+            ("next_obs", np.int64, ()),
+            ("obs_dqn", np.int64, (stack,)),
+            ("next_obs_dqn", np.int64, (stack,)),
+            ("objects", OBJECT_DTYPE, (max_objects,)),
+            ("next_objects", OBJECT_DTYPE, (max_objects,)),
+            ("action", np.int16, ()),
+            ("reward", np.float32, ()),
+            ("original_reward", np.float32, ()),
+            ("done", np.bool_, ()),
+        ]:
+            self.columns[name] = _ColumnFile(
+                os.path.join(path, f"{name}.npy"), dtype, shape, frames)
+        self.rows = 0
+        self.categories = {}
+        self.object_props = {}
+        self.truncated_objects = 0
+
+    def encode_objects(self, objects):
+        """
+        Converts a list of game objects into a structured array of ``max_objects`` slots.
+        """
+        encoded = np.zeros(self.max_objects, dtype=OBJECT_DTYPE)
+        encoded["category"] = -1
+        slot = 0
+        for obj in objects:
+            if not obj:
+                continue  # empty slot (NoObject or invisible object)
+            if slot == self.max_objects:
+                self.truncated_objects += 1
+                break
+            category = obj.category
+            if category not in self.categories:
+                self.categories[category] = len(self.categories)
+                self.object_props[category] = obj.properties
+            encoded[slot] = (self.categories[category], obj.x, obj.y, obj.w, obj.h, obj.rgb)
+            slot += 1
+        return encoded
+
+    def append(self, **sample):
+        """
+        Writes a sample at the next row, with a value for every column. Observations are given as
+        frames (an RGB screen, a stack of grayscale frames), objects as lists of game objects or as
+        arrays returned by ``encode_objects``.
+        """
+        if self.rows == self.frames:
+            raise IndexError(f"The dataset is full ({self.frames} frames)")
+        if sample.keys() != self.columns.keys():
+            raise KeyError(f"A sample needs the columns {list(self.columns)}")
+        for name, value in sample.items():
+            if name in ("objects", "next_objects") and not isinstance(value, np.ndarray):
+                value = self.encode_objects(value)
+            elif name in ("obs", "next_obs"):
+                value = self.frame_stores["rgb_frames"].put(value)
+            elif name in ("obs_dqn", "next_obs_dqn"):
+                value = [self.frame_stores["gray_frames"].put(frame) for frame in value]
+            self.columns[name].append(value)
+        self.rows += 1
+        if self.rows % self.flush_every == 0:
+            self.flush()
+
+    def flush(self):
+        for column in self.columns.values():
+            column.flush()
+        for store in self.frame_stores.values():
+            store.file.flush()
+
+    def close(self, metadata):
+        """
+        Trims the files to the written rows and writes the metadata, completed with the layout of
+        the arrays.
+        """
+        metadata = dict(metadata)
+        metadata.update({
+            "num_rows": self.rows,
+            "num_columns": len(self.columns),
+            "column_names": list(self.columns),
+            "data_types": {name: f"numpy.ndarray of {column.dtype}, {column.shape}"
+                           for name, column in self.columns.items()},
+            "frame_columns": self.FRAME_COLUMNS,
+            "frame_counts": {name: store.file.rows for name, store in self.frame_stores.items()},
+            "object_categories": list(self.categories),
+            "objects_props": self.object_props,
+        })
+        if self.truncated_objects:
+            print(f"{self.truncated_objects} samples had more than {self.max_objects} objects")
+        for column in self.columns.values():
+            column.close()
+        for store in self.frame_stores.values():
+            store.file.close()
+        with open(os.path.join(self.path, "metadata.json"), "w") as f:
+            json.dump(metadata, f, indent=4)
+        self.columns = {}
+
+
+class FrameColumn:
+    """
+    An observation column of a dataset, whose rows are rebuilt from the stored frames when indexed
+    (``column[i]``, ``column[i:j]``, ``column[[i, j]]``).
+    """
+
+    def __init__(self, references, frames):
+        self.references = references
+        self.frames = frames
+
+    def __len__(self):
+        return len(self.references)
+
+    @property
+    def shape(self):
+        return self.references.shape + self.frames.shape[1:]
+
+    @property
+    def dtype(self):
+        return self.frames.dtype
+
+    def __getitem__(self, index):
+        return self.frames[np.asarray(self.references[index])]
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self[:], dtype=dtype)
+
+
+def load_dataset(path, columns=None):
+    """
+    Opens a dataset written by ``DatasetWriter``, memory-mapped (nothing is read until accessed).
+
+    :param path: Directory of the dataset
+    :param columns: Names of the columns to open, all if None
+    :return: Tuple of a dictionary column name -> array (``FrameColumn`` for the observations) of
+        ``num_rows`` rows, and the metadata
+    """
+    with open(os.path.join(path, "metadata.json")) as f:
+        metadata = json.load(f)
+    frames = {}
+    data = {}
+    for name in columns or metadata["column_names"]:
+        data[name] = np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+        store = metadata["frame_columns"].get(name)
+        if store is not None:
+            if store not in frames:
+                frames[store] = np.load(os.path.join(path, f"{store}.npy"), mmap_mode="r")
+            data[name] = FrameColumn(data[name], frames[store])
+    return data, metadata
@@ -5,10 +5,9 @@ import random
 
 # appends parent path to syspath to make ocatari importable
 # like it would have been installed as a package
-from copy import deepcopy
-from os import makedirs
+import itertools
 import json
-import pandas as pd
+import multiprocessing as mp
 import numpy as np
 import os
 import torch
@@ -16,15 +15,19 @@ from datetime import datetime
 
 # sys.path.append(path.dirname(path.dirname(path.abspath(__file__)))) # noqa
 from hackatari.core import HackAtari
-from ocatari.utils import load_agent, parser
+from ocatari.utils import load_agent
 
 # from ocatari.vision.space_invaders import objects_colors
 from tqdm import tqdm
-from utils import get_dtypes, get_obj_props
+from dataset_writer import DatasetWriter
 import argparse
+import hashlib
+import traceback
 
 parser = argparse.ArgumentParser(description="HackAtari run.py Argument Setter")
-parser.add_argument("-g", "--game", type=str, default="Seaquest", help="Game to be run")
+parser.add_argument(
+    "-g", "--game", type=str, nargs="+", default=["Seaquest"], help="Game(s) to be run"
+)
 parser.add_argument(
     "-m",
     "--modifs",
@@ -33,7 +36,14 @@ parser.add_argument(
     help="List of the modifications to be brought to the game",
 )
 parser.add_argument(
-    "-s", "--seed", type=int, default=0, help="Make the generation deterministic."
+    "-ms",
+    "--modif_sets",
+    nargs="+",
+    default=None,
+    help="Several modification sets to generate shards for, comma separated ('none' for the original game). Replaces --modifs",
+)
+parser.add_argument(
+    "-s", "--seed", type=int, nargs="+", default=[0], help="Make the generation deterministic. One shard per seed"
 )
 parser.add_argument(
     "-p",
@@ -56,8 +66,9 @@ parser.add_argument(
     "-a",
     "--agent",
     type=str,
-    default="",
-    help="Path to the cleanrl trained agent to be loaded.",
+    nargs="+",
+    default=[""],
+    help="Path(s) to the cleanrl trained agent(s) to be loaded.",
 )
 parser.add_argument(
     "-c", "--creator", type=str, default="", help="Name of the creator of this dataset"
@@ -67,7 +78,7 @@ parser.add_argument(
     "--frames",
     type=int,
     default=10000,
-    help="How many frames should be generated.",
+    help="How many frames should be generated (per shard).",
 )
 parser.add_argument(
     "-e",
@@ -76,176 +87,246 @@ parser.add_argument(
     default=0.1,
     help="The random probability of the state being added to the dataset.",
 )
-
-args = parser.parse_args()
-
-# Init the environment
-env = HackAtari(
-    args.game,
-    args.modifs,
-    args.reward_function,
-    args.color_swaps,
-    render_mode="human",
-    obs_mode="dqn",
-    mode="vision",
+parser.add_argument(
+    "-w",
+    "--workers",
+    type=int,
+    default=1,
+    help="Number of processes generating shards in parallel.",
 )
-
-# Set up an agent
-if args.agent:
-    agent = load_agent(args.agent, env.action_space.n)
-    print(f"Loaded agents from {args.agent}")
-
-# make environment deterministic
-env.action_space.seed(args.seed)
-np.random.seed(args.seed)
-torch.manual_seed(args.seed)
-os.environ["PYTHONHASHSEED"] = str(args.seed)
-torch.use_deterministic_algorithms(True)
-torch.backends.cudnn.deterministic = True
-torch.backends.cudnn.benchmark = False
-random.seed(args.seed)
-# set_random_seed(args.seed)
-env.env.seed(args.seed)
-env.env.action_space.seed(args.seed)
-env.env.seed(args.seed)
-# Init an empty dataset
-game_nr = 0
-turn_nr = 0
-dataset = {
-    "index": [],
-    "obs": [],
-    "action": [],
-    "next_obs": [],
-    "obs_dqn": [],
-    "next_obs_dqn": [],
-    "objects": [],
-    "next_objects": [],
-    "reward": [],
-    "original_reward": [],
-    "done": [],
-}
-
-obs, info = env.reset()
-
-now = datetime.now()
-dt_string = now.strftime("%d/%m/%Y %H:%M:%S")
-
-
-# Generate 10,000 samples
-counts = 0
-with tqdm(total=args.frames) as pbar:
-    while counts < args.frames:
-        selected = (
-            random.random() < args.epsilon
-        )  # and same_object_list(env.objects, env.objects_v)
-        if selected:
-            state = deepcopy(torch.tensor(env.get_rgb_state))
-            dqn_state = deepcopy(env.dqn_obs[0])
-            objects = deepcopy(env.objects)
-
-        if args.agent:
-            action = agent.draw_action(env.dqn_obs)
-        else:
-            action = env.action_space.sample()
-        obs, reward, terminated, truncated, info = env.step(action)
-        step = f"{'%0.5d' % (game_nr)}_{'%0.5d' % (turn_nr)}"
-
-        if selected:
-            dataset["index"].append(step)
-            dataset["obs"].append(state)
-            dataset["obs_dqn"].append(dqn_state)
-            dataset["action"].append(action.item())
-            dataset["next_obs"].append(torch.tensor(env.get_rgb_state))
-            dataset["next_obs_dqn"].append(env.dqn_obs[0])
-            dataset["objects"].append(objects)
-            dataset["next_objects"].append(env.objects)
-            dataset["reward"].append(reward)
-            dataset["original_reward"].append(env.org_reward)
-            dataset["done"].append(terminated or truncated)
-            pbar.update(1)
-            counts += 1
-
-        turn_nr = turn_nr + 1
-
-        # if a game is terminated, restart with a new game and update turn and game counter
-        if terminated or truncated:
-            obs, info = env.reset()
-            turn_nr = 0
-            game_nr = game_nr + 1
-
-env.close()
-
-
-df = pd.DataFrame(
-    dataset,
-    columns=[
-        "index",
-        "obs",
-        "next_obs",
-        "obs_dqn",
-        "next_obs_dqn",
-        "objects",
-        "next_objects",
-        "action",
-        "reward",
-        "original_reward",
-        "done",
-    ],
+parser.add_argument(
+    "-o", "--output", type=str, default="data/datasets", help="Directory of the datasets"
 )
 
-df[["action", "reward", "original_reward", "done"]] = df[
-    ["action", "reward", "original_reward", "done"]
-].apply(pd.to_numeric, downcast="float")
-# Metadata dictionary
-metadata = {
-    "dataset_name": "HackAtari-DS",
-    "game": args.game,
-    "modification": args.modifs,
-    "reward_function": args.reward_function,
-    "agent": args.agent,
-    "agent_type": "If an agent is given (see above), this agent is used to play the game. Random if no agent was given.",
-    "created_by": args.creator,
-    "creation_date": dt_string,
-    "seed": args.seed,
-    "epsilon": "The random probability of the state being added to the dataset.",
-    "epsilon_value": args.epsilon,
-    "description": "This dataset was describes an agent playing a HackAtari game variant.",
-    "source": "Generated manually by letting the agent play on the HackAtari game variant, described by the game name and modifications above. \
-       An alternative reward_function (see above) can be given.",
-    "num_rows": len(df),
-    "num_columns": len(df.columns),
-    "column_names": list(df.columns),
-    "data_types": get_dtypes(df),
-    "objects_props": get_obj_props(df["objects"]),
-    "objects_props_description": "The objects properties are extracted from the objects list in the dataset. Not all properties are listed, the most useful ones only",
-    "obs": "A 210x160x3 RGB image as a torch tensor of the current state",
-    "obs_dqn": "A 4x84x84 grayscaled image (as torch tensor) of the last four states used by DQN agents to learn",
-    "action": f"describes the action taken in this state. Actions are {env._env.env.env.get_action_meanings()}",
-    "next_obs": "the resulting RGB state after taking the action in the state above",
-    "next_obs_dqn": "the resulting Black and White DQN-style state after taking the action in the state above",
-    "reward": "Describes the reward given for the action a in state s",
-    "original_reward": "If an alternative reward function was given, original_reward describe the default reward, else it is 0",
-    "done": "Is one if the action ended the game",
-    "missing_values": df.isnull().sum().to_dict(),
-    "transformations": "None",
-    "license": "CC BY 4.0",
-    "version": "1.0.0",
-}
-
-# Save metadata to a JSON file
-
-basepath = "data/datasets"
-makedirs(basepath, exist_ok=True)
-makedirs(f"{basepath}/ALE", exist_ok=True)
-prefix = f"{args.game}_dqn_agent" if args.agent else f"{args.game}_random_agent"
-# df.to_csv(f"data/datasets/{prefix}.csv", index=False)
-df_dqn_obs = deepcopy(df)
-df.drop(columns=["obs_dqn", "next_obs_dqn"], inplace=True)
-df_dqn_obs.drop(columns=["obs", "next_obs"], inplace=True)
-df.to_pickle(f"{basepath}/{prefix}_rgb.pkl.gz", compression="gzip")
-df_dqn_obs.to_pickle(f"{basepath}/{prefix}_dqn.pkl.gz", compression="gzip")
-with open(f"{basepath}/{prefix}_metadata.json", "w") as f:
-    json.dump(metadata, f, indent=4)
-
-
-print(f"Finished {args.game}, stored in data/datesets/")
+
+def shard_name(config):
+    """Directory name of the dataset of a configuration"""
+    prefix = f"{config['game']}_dqn_agent" if config["agent"] else f"{config['game']}_random_agent"
+    if not config["sharded"]:
+        return prefix
+    if config["agent"]:
+        # Agents of different directories can share a file name
+        path_hash = hashlib.sha1(os.path.abspath(config["agent"]).encode()).hexdigest()[:8]
+        agent = f"{os.path.splitext(os.path.basename(config['agent']))[0]}-{path_hash}"
+    else:
+        agent = "random"
+    modifs = "_".join(config["modifs"]) if config["modifs"] else "none"
+    return f"{config['game']}_{modifs}_{agent}_seed{config['seed']}"
+
+
+def generate(config):
+    """
+    Generates the dataset of one configuration (game, modifications, agent, seed, ...) into its own
+    directory and returns its manifest entry.
+    """
+    seed = config["seed"]
+    # Init the environment
+    env = HackAtari(
+        config["game"],
+        config["modifs"],
+        config["reward_function"],
+        **config["env_kwargs"],
+    )
+
+    # Set up an agent
+    if config["agent"]:
+        agent, policy = load_agent(config["agent"], env, "cpu")
+        print(f"Loaded agents from {config['agent']}")
+
+    # make environment deterministic
+    env.action_space.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+    os.environ["PYTHONHASHSEED"] = str(seed)
+    torch.use_deterministic_algorithms(True)
+    torch.backends.cudnn.deterministic = True
+    torch.backends.cudnn.benchmark = False
+    random.seed(seed)
+    # Init an empty dataset, written to disk as the samples are drawn
+    game_nr = 0
+    turn_nr = 0
+    path = os.path.join(config["output"], shard_name(config))
+    writer = DatasetWriter(path, config["frames"])
+
+    obs, info = env.reset(seed=seed)
+
+    now = datetime.now()
+    dt_string = now.strftime("%d/%m/%Y %H:%M:%S")
+
+    counts = 0
+    with tqdm(total=config["frames"], disable=config["sharded"]) as pbar:
+        while counts < config["frames"]:
+            selected = (
+                random.random() < config["epsilon"]
+            )  # and same_object_list(env.objects, env.objects_v)
+            if selected:
+                state = env.get_rgb_state
+                dqn_state = obs
+                objects = writer.encode_objects(env.objects)
+
+            if config["agent"]:
+                action = policy(torch.Tensor(obs).unsqueeze(0))[0]
+            else:
+                action = env.action_space.sample()
+            obs, reward, terminated, truncated, info = env.step(action)
+            step = f"{'%0.5d' % (game_nr)}_{'%0.5d' % (turn_nr)}"
+
+            if selected:
+                writer.append(
+                    index=step,
+                    obs=state,
+                    obs_dqn=dqn_state,
+                    action=int(action),
+                    next_obs=env.get_rgb_state,
+                    next_obs_dqn=obs,
+                    objects=objects,
+                    next_objects=env.objects,
+                    reward=reward,
+                    original_reward=env.org_reward,
+                    done=terminated or truncated,
+                )
+                pbar.update(1)
+                counts += 1
+
+            turn_nr = turn_nr + 1
+
+            # if a game is terminated, restart with a new game and update turn and game counter
+            if terminated or truncated:
+                obs, info = env.reset()
+                turn_nr = 0
+                game_nr = game_nr + 1
+
+    env.close()
+
+    # Metadata dictionary
+    metadata = {
+        "dataset_name": "HackAtari-DS",
+        "game": config["game"],
+        "modification": config["modifs"],
+        "reward_function": config["reward_function"],
+        "agent": config["agent"],
+        "agent_type": "If an agent is given (see above), this agent is used to play the game. Random if no agent was given.",
+        "created_by": config["creator"],
+        "creation_date": dt_string,
+        "seed": seed,
+        "epsilon": "The random probability of the state being added to the dataset.",
+        "epsilon_value": config["epsilon"],
+        "hackatari_config": config["env_kwargs"],
+        "description": "This dataset was describes an agent playing a HackAtari game variant.",
+        "source": "Generated manually by letting the agent play on the HackAtari game variant, described by the game name and modifications above. \
+           An alternative reward_function (see above) can be given.",
+        "objects_props_description": "The objects properties are extracted from the objects list in the dataset. Not all properties are listed, the most useful ones only",
+        "objects": "The visible objects of the current state, as a structured array of slots (category index in object_categories, or -1 for empty slots, x, y, w, h, rgb)",
+        "next_objects": "The visible objects of the resulting state, in the same format as objects",
+        "obs": "A 210x160x3 RGB image (uint8 array) of the current state",
+        "obs_dqn": "A 4x84x84 grayscaled image (uint8 array) of the last four states used by DQN agents to learn",
+        "action": f"describes the action taken in this state. Actions are {env._env.env.env.get_action_meanings()}",
+        "next_obs": "the resulting RGB state after taking the action in the state above",
+        "next_obs_dqn": "the resulting Black and White DQN-style state after taking the action in the state above",
+        "reward": "Describes the reward given for the action a in state s",
+        "original_reward": "If an alternative reward function was given, original_reward describe the default reward, else it is 0",
+        "done": "Is one if the action ended the game",
+        "transformations": "None",
+        "license": "CC BY 4.0",
+        "version": "1.0.0",
+    }
+
+    # Save metadata to a JSON file next to the arrays
+    writer.close(metadata)
+
+    print(f"Finished {config['game']}, stored in {path}/")
+    return {
+        "shard": shard_name(config),
+        "path": path,
+        "num_rows": writer.rows,
+        "game": config["game"],
+        "modifs": config["modifs"],
+        "reward_function": config["reward_function"],
+        "agent": config["agent"],
+        "seed": seed,
+        "frames": config["frames"],
+        "epsilon": config["epsilon"],
+        "hackatari_config": config["env_kwargs"],
+    }
+
+
+def generate_shard(config):
+    """
+    Generates the shard of a configuration in a worker. A failure is returned as the manifest entry
+    of the shard with its traceback, so the other shards are still recorded.
+    """
+    try:
+        return generate(config)
+    except Exception:
+        return {
+            "shard": shard_name(config),
+            "game": config["game"],
+            "modifs": config["modifs"],
+            "agent": config["agent"],
+            "seed": config["seed"],
+            "error": traceback.format_exc(),
+        }
+
+
+def main():
+    args = parser.parse_args()
+    if args.modif_sets is None:
+        modif_sets = [args.modifs]
+    else:
+        modif_sets = [[] if mods == "none" else mods.split(",") for mods in args.modif_sets]
+    configs = list(itertools.product(args.game, modif_sets, args.agent, args.seed))
+    sharded = len(configs) > 1 or args.workers > 1
+    env_kwargs = {
+        "render_mode": None if sharded else "human",
+        "obs_mode": "dqn",
+        "mode": "vision",
+    }
+    configs = [
+        {
+            "game": game,
+            "modifs": modifs,
+            "agent": agent,
+            "seed": seed,
+            "reward_function": args.reward_function,
+            "frames": args.frames,
+            "epsilon": args.epsilon,
+            "creator": args.creator,
+            "output": args.output,
+            "env_kwargs": env_kwargs,
+            "sharded": sharded,
+        }
+        for game, modifs, agent, seed in configs
+    ]
+    if not sharded:
+        generate(configs[0])
+        return
+
+    # One shard per configuration, generated in parallel, then a manifest of all the shards
+    shards, failed = [], []
+    with mp.Pool(args.workers) as pool:
+        for shard in tqdm(pool.imap_unordered(generate_shard, configs), total=len(configs)):
+            if "error" in shard:
+                print(f"Shard {shard['shard']} failed:\n{shard['error']}")
+                failed.append(shard)
+            else:
+                shards.append(shard)
+    shards.sort(key=lambda shard: shard["shard"])
+    failed.sort(key=lambda shard: shard["shard"])
+    manifest = {
+        "dataset_name": "HackAtari-DS",
+        "created_by": args.creator,
+        "creation_date": datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
+        "num_shards": len(shards),
+        "num_rows": sum(shard["num_rows"] for shard in shards),
+        "shards": shards,
+        "failed_shards": failed,
+    }
+    os.makedirs(args.output, exist_ok=True)
+    with open(os.path.join(args.output, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=4)
+    print(f"Finished {len(shards)} shards ({len(failed)} failed), manifest stored in "
+          f"{args.output}/manifest.json")
+
+
+if __name__ == "__main__":
+    main()
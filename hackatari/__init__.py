@@ -1 +1,28 @@
-from .core import HackAtari, HumanPlayable
+import importlib
+
+# The environments are imported on first access, so that ``import hackatari`` (or the registry)
+# does not pull in OCAtari, the emulator, pygame and cv2
+_LAZY_ATTRIBUTES = {
+    "HackAtari": "core",
+    "HumanPlayable": "core",
+    "HackAtariVectorEnv": "vector",
+    "HackAtariProcessVectorEnv": "vector",
+}
+_SUBMODULES = {"bench", "core", "extraction", "games", "metrics", "objects", "profiling", "ram_patches", "registry", "rewards", "rng", "vector"}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module(f".{_LAZY_ATTRIBUTES[name]}", __name__), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(f".{name}", __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES) | _SUBMODULES)
@@ -0,0 +1,495 @@
+"""
+Throughput benchmarks of HackAtari.
+
+Run with ``python -m hackatari.bench``. The frameskip benchmark measures the frames per second of
+every game in ``hackatari/games`` with lean intermediate frames turned off and on, the phases
+benchmark breaks the step time of every game down by phase and modification (see
+``hackatari.profiling``), the import benchmark measures the cold-start time of the main import
+paths in fresh interpreters.
+
+The suite benchmark measures the steps and resets per second of every game under every
+observation and extraction mode, then the cost of every modification of the game, of all its
+modifications stacked (and of any stacks given with ``--stacks``), of Dopamine pooling and of the
+custom reward functions of ``hackatari/context``. Its results can be written to a json file
+(``--json``) and compared against the file of an earlier run (``--baseline``).
+
+The gate benchmark runs every modification of every game on its own and fails (exit status 1)
+when the time spent in a modification exceeds a budget, relative to the step time of the
+unmodified game (``--budget``, in percent) or absolute (``--budget_us``).
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+from tabulate import tabulate
+
+
+GAMES_DIR = os.path.join(os.path.dirname(__file__), "games")
+CONTEXT_DIR = os.path.join(os.path.dirname(__file__), "context")
+
+
+def available_games():
+    """
+    Returns the ALE names of all the games that have a modification module.
+    """
+    from ocatari.core import AVAILABLE_GAMES
+
+    ale_names = {game.lower(): game for game in AVAILABLE_GAMES}
+    modules = sorted(f[:-3] for f in os.listdir(GAMES_DIR)
+                     if f.endswith(".py") and not f.startswith("_"))
+    return [ale_names[module] for module in modules if module in ale_names]
+
+
+def measure_fps(game, steps=1000, lean_frameskip=False, modifs=[], seed=0, **kwargs):
+    """
+    Measures the emulated frames per second of one environment under random actions.
+
+    :param game: Name of the game
+    :param steps: Number of environment steps to time
+    :param lean_frameskip: Whether the intermediate frames are lean
+    :param modifs: List of modifications to apply
+    :param seed: Seed of the environment and of the actions
+    :return: Frames per second, counting every skipped frame
+    """
+    from hackatari.core import HackAtari
+
+    env = HackAtari(game, modifs, lean_frameskip=lean_frameskip, **kwargs)
+    random.seed(seed)
+    env.reset(seed=seed)
+    env.action_space.seed(seed)
+    actions = [env.action_space.sample() for _ in range(steps)]
+    start = time.perf_counter()
+    for action in actions:
+        _, _, terminated, truncated, _ = env.step(action)
+        if terminated or truncated:
+            env.reset()
+    elapsed = time.perf_counter() - start
+    env.close()
+    return steps * env._frameskip / elapsed
+
+
+def bench_frameskip(games, steps=1000, **kwargs):
+    """
+    Runs the frameskip benchmark on the given games.
+
+    :return: List of dictionaries with the game and the fps with lean frames off and on
+    """
+    results = []
+    for game in games:
+        full = measure_fps(game, steps, lean_frameskip=False, **kwargs)
+        lean = measure_fps(game, steps, lean_frameskip=True, **kwargs)
+        results.append({"game": game, "fps": full, "fps_lean": lean, "speedup": lean / full})
+    return results
+
+
+def profile_phases(game, steps=1000, modifs=[], seed=0, **kwargs):
+    """
+    Times the phases of the steps of one environment under random actions.
+
+    :return: Summary of the profiler of the environment, see ``PhaseProfiler.summary``
+    """
+    from hackatari.core import HackAtari
+
+    env = HackAtari(game, modifs, profile=True, **kwargs)
+    random.seed(seed)
+    env.reset(seed=seed)
+    env.action_space.seed(seed)
+    env.profiler.clear()
+    for _ in range(steps):
+        _, _, terminated, truncated, _ = env.step(env.action_space.sample())
+        if terminated or truncated:
+            env.reset()
+    env.close()
+    return env.profiler.summary()
+
+
+def measure_throughput(game, steps=200, resets=20, modifs=[], seed=0, repeat=3, **kwargs):
+    """
+    Measures the steps and resets per second of one environment under random actions.
+
+    :param game: Name of the game
+    :param steps: Number of environment steps to time
+    :param resets: Number of resets to time
+    :param modifs: List of modifications to apply
+    :param seed: Seed of the environment and of the actions
+    :param repeat: Number of times the same steps and resets are timed, the fastest counts
+    :return: Tuple of the steps per second and the resets per second
+    """
+    from hackatari.core import HackAtari
+
+    env = HackAtari(game, modifs, **kwargs)
+    random_state = random.getstate()
+    try:
+        env.action_space.seed(seed)
+        actions = [env.action_space.sample() for _ in range(steps)]
+        step_time = reset_time = float("inf")
+        for _ in range(repeat):
+            random.seed(seed)
+            env.reset(seed=seed)
+            start = time.perf_counter()
+            for action in actions:
+                _, _, terminated, truncated, _ = env.step(action)
+                if terminated or truncated:
+                    env.reset()
+            step_time = min(step_time, time.perf_counter() - start)
+            start = time.perf_counter()
+            for _ in range(resets):
+                env.reset()
+            reset_time = min(reset_time, time.perf_counter() - start)
+    finally:
+        random.setstate(random_state)
+        env.close()
+    return steps / step_time, resets / reset_time
+
+
+def reward_functions(game):
+    """
+    Returns the paths of the custom reward functions of a game in ``hackatari/context``.
+    """
+    directory = os.path.join(CONTEXT_DIR, game.lower())
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, f) for f in sorted(os.listdir(directory)) if f.endswith(".py")]
+
+
+def suite_configurations(game, obs_modes=("ori", "dqn", "obj"), modes=("ram", "vision"),
+                         obs_mode="dqn", mode="ram", stacks=()):
+    """
+    Returns the configurations measured by the suite benchmark for one game.
+
+    Every observation mode is combined with every extraction mode. The modifications, the stacks,
+    Dopamine pooling and the reward functions are measured in the reference configuration
+    (``obs_mode``, ``mode``), against which their cost is computed.
+
+    :param stacks: Lists of modifications measured together, on the games that have all of them
+    :return: List of dictionaries with the kind of the configuration, the obs_mode, mode,
+        modifications, dopamine_pooling and reward function
+    """
+    from hackatari.registry import modification_names
+
+    def config(kind, obs_mode=obs_mode, mode=mode, modifs=(), dopamine_pooling=False, reward=None):
+        return {"kind": kind, "obs_mode": obs_mode, "mode": mode, "modifs": list(modifs),
+                "dopamine_pooling": dopamine_pooling, "reward": reward}
+
+    configs = [config("reference")]
+    configs += [config("base", o, m) for o in obs_modes for m in modes if (o, m) != (obs_mode, mode)]
+    names = modification_names(game)
+    configs += [config("modification", modifs=[name]) for name in names]
+    if len(names) > 1:
+        configs.append(config("stack", modifs=names))
+    configs += [config("stack", modifs=stack) for stack in stacks
+                if stack and all(name in names for name in stack)]
+    configs.append(config("pooling", dopamine_pooling=True))
+    configs += [config("reward", reward=os.path.relpath(path, os.path.dirname(CONTEXT_DIR)))
+                for path in reward_functions(game)]
+    return configs
+
+
+def bench_suite(games, steps=200, resets=20, seed=0, repeat=3, frameskip=4, log=print, **kwargs):
+    """
+    Runs the suite benchmark on the given games.
+
+    The cost of a configuration is its time per step minus the one of the reference configuration
+    of its game. A configuration that fails (e.g. an unsupported mode) is reported with its error.
+
+    :param log: Called with every result as it is measured, None for silence
+    :param kwargs: Keyword arguments of ``suite_configurations``
+    :return: List of dictionaries, one per configuration, with the game, the configuration, the
+        steps and resets per second, the time per step and the cost in µs
+    """
+    results = []
+    for game in games:
+        reference_us = None
+        for config in suite_configurations(game, **kwargs):
+            result = {"game": game, **config}
+            try:
+                steps_per_sec, resets_per_sec = measure_throughput(
+                    game, steps, resets, config["modifs"], seed, repeat, frameskip=frameskip,
+                    obs_mode=config["obs_mode"], mode=config["mode"],
+                    dopamine_pooling=config["dopamine_pooling"],
+                    rewardfunc_path=config["reward"] and os.path.join(
+                        os.path.dirname(CONTEXT_DIR), config["reward"]),
+                    hud=False, render_mode=None)
+            except Exception as e:
+                result["error"] = f"{type(e).__name__}: {e}"
+            else:
+                step_us = 1e6 / steps_per_sec
+                if config["kind"] == "reference":
+                    reference_us = step_us
+                result.update({
+                    "steps_per_sec": steps_per_sec,
+                    "resets_per_sec": resets_per_sec,
+                    "step_us": step_us,
+                    "cost_us": None if reference_us is None else step_us - reference_us,
+                })
+            results.append(result)
+            if log is not None:
+                log(_format_suite_row(result))
+    return results
+
+
+def _suite_key(result):
+    return (result["game"], result["obs_mode"], result["mode"], tuple(result["modifs"]),
+            result["dopamine_pooling"], result["reward"])
+
+
+def _describe_config(result):
+    parts = [result["obs_mode"], result["mode"]]
+    if result["kind"] == "stack" and len(result["modifs"]) > 3:
+        parts.append(f"{len(result['modifs'])} modifications")
+    elif result["modifs"]:
+        parts.append("+".join(result["modifs"]))
+    if result["dopamine_pooling"]:
+        parts.append("pooling")
+    if result["reward"]:
+        parts.append(os.path.basename(result["reward"]))
+    return " ".join(parts)
+
+
+def _format_suite_row(result):
+    if "error" in result:
+        return f"{result['game']:<16} {_describe_config(result):<60} {result['error'][:60]}"
+    cost = "" if result["cost_us"] is None or result["kind"] == "reference" \
+        else f"{result['cost_us']:+9.1f} µs"
+    return (f"{result['game']:<16} {_describe_config(result):<60} "
+            f"{result['steps_per_sec']:8.0f} steps/s {result['resets_per_sec']:8.1f} resets/s {cost}")
+
+
+def load_suite(path):
+    """
+    Reads the suite results of a json file written by ``python -m hackatari.bench --json``.
+    """
+    with open(path) as f:
+        results = json.load(f)
+    return results["suite"] if isinstance(results, dict) else results
+
+
+def compare_suite(results, baseline):
+    """
+    Compares suite results against the results of an earlier run, matching the configurations.
+
+    :return: List of dictionaries with the game, the configuration, the steps per second of the
+        baseline and of the results and their ratio, for the configurations measured in both
+    """
+    previous = {_suite_key(r): r for r in baseline if "error" not in r}
+    rows = []
+    for result in results:
+        before = previous.get(_suite_key(result))
+        if before is None or "error" in result:
+            continue
+        rows.append({
+            "game": result["game"],
+            "config": _describe_config(result),
+            "baseline_steps_per_sec": before["steps_per_sec"],
+            "steps_per_sec": result["steps_per_sec"],
+            "ratio": result["steps_per_sec"] / before["steps_per_sec"],
+        })
+    return rows
+
+
+# Phases holding the time spent in the modifications, see hackatari.profiling
+MODIFICATION_PHASES = ("step_modifications", "post_detection_modifications")
+
+
+def _modification_us(summary, steps):
+    """
+    Time per step spent in the modifications, from the summary of a profiler.
+    """
+    total_ms = sum(r["total_ms"] for r in summary
+                   if r["phase"] in MODIFICATION_PHASES or r["phase"].startswith("reset:"))
+    return 1e3 * total_ms / steps
+
+
+def modification_costs(game, steps=500, seed=0, modifications=None, **kwargs):
+    """
+    Measures the cost of every modification of a game, each one run on its own under random
+    actions.
+
+    The cost of a modification is the time per step spent in its step, reset and post-detection
+    functions (including the RAM reads and writes of the step modifications), minus the same time
+    in the unmodified game. Only the modification code is timed, so the cost does not depend on
+    the changes of the game dynamics (e.g. longer or shorter episodes).
+
+    :param modifications: Names of the modifications to measure, all the modifications of the
+        game if None
+    :return: List of dictionaries with the game, the modification, its cost in µs per step and
+        its overhead relative to the step time of the unmodified game, or its error
+    """
+    from hackatari.registry import modification_names
+
+    reference = profile_phases(game, steps, [], seed, **kwargs)
+    reference_us = _modification_us(reference, steps)
+    step_us = next(r["mean_us"] for r in reference if r["phase"] == "step")
+    results = []
+    for name in modification_names(game) if modifications is None else modifications:
+        result = {"game": game, "modification": name, "step_us": step_us}
+        try:
+            summary = profile_phases(game, steps, [name], seed, **kwargs)
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        else:
+            cost_us = _modification_us(summary, steps) - reference_us
+            result.update({"cost_us": cost_us, "overhead": cost_us / step_us})
+        results.append(result)
+    return results
+
+
+def bench_gate(games, steps=500, budget=10.0, budget_us=None, seed=0, **kwargs):
+    """
+    Runs the gate benchmark: measures the cost of every modification of the given games and
+    checks it against the budgets.
+
+    :param budget: Maximal overhead of a modification, in percent of the unmodified step time
+    :param budget_us: Maximal cost of a modification in µs per step, not checked if None
+    :return: List of the results of ``modification_costs``, with ``passed`` set on every result (a
+        modification that raises an error does not pass)
+    """
+    results = []
+    for game in games:
+        for result in modification_costs(game, steps, seed, **kwargs):
+            result["passed"] = "error" not in result \
+                and 100 * result["overhead"] <= budget \
+                and (budget_us is None or result["cost_us"] <= budget_us)
+            results.append(result)
+    return results
+
+
+# Import statements timed by the import benchmark
+IMPORT_STATEMENTS = [
+    "import hackatari",
+    "import hackatari.registry; hackatari.registry.load_registry()",
+    "from hackatari import HackAtari",
+    "from hackatari import HackAtariVectorEnv",
+    "from hackatari import HumanPlayable; import pygame",
+]
+
+
+def _time_interpreter(statement, repeat):
+    """
+    Best wall time of running a statement in a fresh interpreter.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_imports(statements=IMPORT_STATEMENTS, repeat=5):
+    """
+    Measures the cold-start time of import statements, without the interpreter startup.
+
+    :return: List of dictionaries with the statement, its time in ms and the heavy modules it loaded
+    """
+    startup = _time_interpreter("pass", repeat)
+    heavy = ("ocatari", "ale_py", "pygame", "cv2", "torch")
+    results = []
+    for statement in statements:
+        elapsed = _time_interpreter(statement, repeat)
+        loaded = subprocess.run(
+            [sys.executable, "-c", f"{statement}; import sys; "
+             f"print(','.join(m for m in {heavy!r} if m in sys.modules))"],
+            check=True, capture_output=True, text=True).stdout.strip().splitlines()
+        results.append({"statement": statement, "ms": 1000 * (elapsed - startup),
+                         "loaded": loaded[-1] if loaded else ""})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HackAtari throughput benchmarks")
+    parser.add_argument("-b", "--benchmarks", nargs="+", default=["frameskip"],
+                        choices=["frameskip", "phases", "imports", "suite", "gate"],
+                        help="Benchmarks to run")
+    parser.add_argument("-g", "--games", nargs="+", default=None,
+                        help="Games to benchmark (default: all games with modifications)")
+    parser.add_argument("-s", "--steps", type=int, default=1000,
+                        help="Environment steps per measurement")
+    parser.add_argument("-f", "--frameskip", type=int, default=4,
+                        help="Frames skipped after each action + 1 (default = 4)")
+    parser.add_argument("-obs", "--obs_mode", type=str, default="obj",
+                        help="The observation mode (ori, dqn, obj)")
+    parser.add_argument("-m", "--modifs", nargs="+", default=[],
+                        help="Modifications applied in the phases benchmark")
+    parser.add_argument("-j", "--json", type=str, default=None,
+                        help="Write the results to this json file")
+    parser.add_argument("-r", "--resets", type=int, default=20,
+                        help="Resets per measurement of the suite benchmark")
+    parser.add_argument("-rp", "--repeat", type=int, default=3,
+                        help="Timings per measurement of the suite benchmark, the fastest counts")
+    parser.add_argument("-st", "--stacks", nargs="+", default=[],
+                        help="Comma separated stacks of modifications measured by the suite benchmark")
+    parser.add_argument("--budget", type=float, default=10.0,
+                        help="Overhead budget of a modification in the gate benchmark, in percent "
+                             "of the step time of the unmodified game")
+    parser.add_argument("--budget_us", type=float, default=None,
+                        help="Absolute budget of a modification in the gate benchmark, in µs per step")
+    parser.add_argument("--baseline", type=str, default=None,
+                        help="json file of an earlier run to compare the suite results against")
+    args = parser.parse_args()
+
+    results = {}
+    if "frameskip" in args.benchmarks:
+        games = args.games or available_games()
+        results["frameskip"] = bench_frameskip(
+            games, args.steps, frameskip=args.frameskip, obs_mode=args.obs_mode, mode="ram",
+            hud=False, render_mode=None)
+        print(tabulate([[r["game"], f"{r['fps']:.0f}", f"{r['fps_lean']:.0f}",
+                         f"{r['speedup']:.2f}x"] for r in results["frameskip"]],
+                       headers=["Game", "FPS", "FPS (lean)", "Speedup"]))
+    if "phases" in args.benchmarks:
+        results["phases"] = {}
+        for game in args.games or available_games():
+            summary = profile_phases(game, args.steps, args.modifs, frameskip=args.frameskip,
+                                     obs_mode=args.obs_mode, mode="ram", hud=False,
+                                     render_mode=None)
+            results["phases"][game] = summary
+            print(f"\n{game}")
+            print(tabulate([[r["phase"], r["calls"], f"{r['total_ms']:.1f}",
+                             f"{r['mean_us']:.1f}", f"<{r['p99_us']:.1f}"] for r in summary],
+                           headers=["Phase", "Calls", "Total (ms)", "Mean (µs)", "p99 (µs)"]))
+    if "imports" in args.benchmarks:
+        results["imports"] = bench_imports()
+        print(tabulate([[r["statement"], f"{r['ms']:.0f}", r["loaded"]]
+                        for r in results["imports"]],
+                       headers=["Import", "ms", "Heavy modules loaded"]))
+    if "suite" in args.benchmarks:
+        results["suite"] = bench_suite(
+            args.games or available_games(), args.steps, args.resets, repeat=args.repeat,
+            frameskip=args.frameskip,
+            stacks=[stack.split(",") for stack in args.stacks])
+        if args.baseline:
+            rows = compare_suite(results["suite"], load_suite(args.baseline))
+            print(f"\nCompared to {args.baseline}:")
+            print(tabulate([[r["game"], r["config"], f"{r['baseline_steps_per_sec']:.0f}",
+                             f"{r['steps_per_sec']:.0f}", f"{r['ratio']:.2f}x"] for r in rows],
+                           headers=["Game", "Configuration", "Baseline (steps/s)", "Steps/s",
+                                    "Ratio"]))
+    if "gate" in args.benchmarks:
+        results["gate"] = bench_gate(args.games or available_games(), args.steps, args.budget,
+                                     args.budget_us, frameskip=args.frameskip,
+                                     obs_mode=args.obs_mode, mode="ram", hud=False,
+                                     render_mode=None)
+        print(tabulate([[r["game"], r["modification"],
+                         r.get("error", "")[:60] or f"{r['cost_us']:.1f}",
+                         "" if "error" in r else f"{100 * r['overhead']:.1f}%",
+                         "ok" if r["passed"] else "FAIL"] for r in results["gate"]],
+                       headers=["Game", "Modification", "Cost (µs/step)", "Overhead", "Budget"]))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if "gate" in args.benchmarks:
+        failed = [r for r in results["gate"] if not r["passed"]]
+        if failed:
+            print(f"\n{len(failed)} modifications over budget or failing: "
+                  + ", ".join(f"{r['game']}.{r['modification']}" for r in failed))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,18 +4,33 @@ onLetterDown = False
 startLetterFromBottom = False
 
 
+def reset():
+    """
+    Reset the episode state of the reward.
+    """
+    global goRight
+    global onLetterUp
+    global onLetterDown
+    global startLetterFromBottom
+    goRight = True
+    onLetterUp = False
+    onLetterDown = False
+    startLetterFromBottom = False
+
+
 def reward_function(self) -> float:
     global goRight
     global onLetterUp
     global onLetterDown
     global startLetterFromBottom
 
-    for obj in self.objects:
-        if "player" in str(obj).lower():
-            player = obj
-            break
+    objects = self.object_arrays
+    player = objects.first("Player")
+    if player is None:
+        return 0
+    dx, dy = int(objects.dx[player]), int(objects.dy[player])
 
-    if player.dx != 0 and (onLetterUp or onLetterDown):
+    if dx != 0 and (onLetterUp or onLetterDown):
         if onLetterUp and startLetterFromBottom:
             goRight = not goRight
         if onLetterDown and not startLetterFromBottom:
@@ -23,23 +38,23 @@ def reward_function(self) -> float:
         onLetterUp = False
         onLetterDown = False
 
-    if player.dy == -1 and player.dx == 0:
+    if dy == -1 and dx == 0:
         if not (onLetterDown or onLetterUp):
             startLetterFromBottom = True
         onLetterUp = True
         onLetterDown = False
-    elif player.dy == 1 and player.dx == 0:
+    elif dy == 1 and dx == 0:
         if not (onLetterDown or onLetterUp):
             startLetterFromBottom = False
         onLetterDown = True
         onLetterUp = False
 
     if goRight == 0:  # even platform, encourage left movement
-        reward = -player.dx
+        reward = -dx
     else:  # encourage right movement
-        reward = player.dx
+        reward = dx
     # Encourage upward movement
-    reward -= player.dy
+    reward -= dy
     if abs(reward) > 50:  # level end
         reward = 100
     # print( onLetterDown, onLetterUp, startLetterFromBottom, reward)
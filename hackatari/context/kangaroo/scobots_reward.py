@@ -2,23 +2,41 @@ import numpy as np
 
 
 def reward_function(self) -> float:
-    for obj in self.objects:
-        if "player" in str(obj).lower():
-            player = obj
-            break
+    objects = self.object_arrays
+    player = objects.first("Player")
+    if player is None:
+        return 0
+    dx, dy = int(objects.dx[player]), int(objects.dy[player])
 
     # Get current platform
     platform = np.ceil(
-        (player.xy[1] - player.h - 16) / 48
+        (int(objects.y[player]) - int(objects.h[player]) - 16) / 48
     )  # 0: topmost, 3: lowest platform
 
     # Encourage moving to the child
     if platform % 2 == 0:  # even platform, encourage left movement
-        reward = -player.dx
+        reward = -dx
     else:  # encourage right movement
-        reward = player.dx
+        reward = dx
     # Encourage upward movement
-    reward -= player.dy / 5
+    reward -= dy / 5
     if abs(reward) > 100:  # level end
         reward = 100
     return reward
+
+
+def batched_reward_function(batch) -> np.ndarray:
+    y = batch.first("Player", "y")
+    h = batch.first("Player", "h")
+    dx = batch.first("Player", "dx")
+    dy = batch.first("Player", "dy")
+
+    # Get current platform
+    platform = np.ceil((y - h - 16) / 48)  # 0: topmost, 3: lowest platform
+
+    # Encourage left movement on even platforms, right movement on odd ones
+    reward = np.where(platform % 2 == 0, -dx, dx)
+    # Encourage upward movement
+    reward -= dy / 5
+    reward[np.abs(reward) > 100] = 100  # level end
+    return reward
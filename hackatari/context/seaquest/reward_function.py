@@ -1,4 +1,5 @@
 from ocatari.ram.seaquest import *
+import numpy as np
 
 LOW_OXYGEN = False
 DIVERS = 0
@@ -6,6 +7,20 @@ COLLISION = False
 COLLECTED = 0
 
 
+def reset():
+    """
+    Reset the episode state of the reward.
+    """
+    global LOW_OXYGEN
+    global DIVERS
+    global COLLISION
+    global COLLECTED
+    LOW_OXYGEN = False
+    DIVERS = 0
+    COLLISION = False
+    COLLECTED = 0
+
+
 def check_collision(obj1, obj2):
     """
     Check if two GameObjects collide based on their bounding boxes.
@@ -88,3 +103,84 @@ def reward_function(self) -> float:
         LOW_OXYGEN = True
 
     return reward
+
+
+# State of the batched reward, one entry per lane
+BATCH_STATE = None
+
+
+def _batch_state(size):
+    """
+    Returns the per-lane state arrays, grown to hold at least ``size`` lanes.
+    """
+    global BATCH_STATE
+    if BATCH_STATE is None or len(BATCH_STATE["divers"]) < size:
+        old = BATCH_STATE
+        BATCH_STATE = {
+            "low_oxygen": np.zeros(size, dtype=bool),
+            "divers": np.zeros(size, dtype=np.int64),
+            "collision": np.zeros(size, dtype=bool),
+            "collected": np.zeros(size, dtype=np.int64),
+        }
+        if old is not None:
+            for key, values in old.items():
+                BATCH_STATE[key][:len(values)] = values
+    return BATCH_STATE
+
+
+def batched_reset(indices):
+    """
+    Reset the episode state of the batched reward for the given lanes.
+    """
+    if BATCH_STATE is None:
+        return
+    for values in BATCH_STATE.values():
+        values[indices[indices < len(values)]] = 0
+
+
+def batched_reward_function(batch) -> np.ndarray:
+    state = _batch_state(int(batch.indices.max()) + 1)
+    lanes = batch.indices
+    low_oxygen = state["low_oxygen"][lanes]
+    divers_before = state["divers"][lanes]
+    collision = state["collision"][lanes]
+    collected = state["collected"][lanes]
+    reward = np.zeros(batch.size)
+
+    px, py = batch.first("Player", "x"), batch.first("Player", "y")
+    pw, ph = batch.first("Player", "w"), batch.first("Player", "h")
+    has_player = batch.mask("Player").any(axis=1)
+
+    # Same bounding boxes as check_collision, with the player enlarged by 5 pixels
+    is_diver = batch.mask("Diver")
+    x, y = batch.objects("x"), batch.objects("y")
+    w, h = batch.objects("w"), batch.objects("h")
+    touching = is_diver \
+        & (px[:, None] < x + w) & (px[:, None] + pw[:, None] + 5 > x) \
+        & (py[:, None] < y + h) & (py[:, None] + ph[:, None] + 5 > y)
+    collision |= has_player & touching.any(axis=1) & (collected != 6)
+
+    divers = is_diver.sum(axis=1)
+    collecting = (divers_before > divers) & collision
+    reward += collecting  # Scaled down reward for collecting a diver
+    collected += collecting
+    collision &= ~collecting
+
+    surfaced = has_player & (py == 45)
+    full = surfaced & (collected == 6)
+    partial = surfaced & ~full & (collected > 0)
+    reward += 100 * full
+    collected[full] = 0
+    collected -= partial
+    refilled = partial & low_oxygen
+    reward += 5 * refilled
+    low_oxygen &= ~refilled
+
+    oxygen = batch.first("OxygenBar", "value", default=np.inf)
+    low_oxygen |= has_player & (oxygen <= 20) & (py != 45)
+
+    state["low_oxygen"][lanes] = low_oxygen
+    state["divers"][lanes] = divers
+    state["collision"][lanes] = collision
+    state["collected"][lanes] = collected
+    return reward
@@ -3,6 +3,14 @@ from ocatari.ram.skiing import *
 REWARD = 32
 
 
+def reset():
+    """
+    Reset the episode state of the reward.
+    """
+    global REWARD
+    REWARD = 32
+
+
 def reward_function_old(self) -> float:
     global REWARD
     ram = self.get_ram()
@@ -1,23 +1,48 @@
+import copy
 import random
+import sys
+from collections import OrderedDict, namedtuple
 import numpy as np
-import pygame
 import importlib
-import sys
+import operator
 from ocatari.core import OCAtari
+from hackatari.ram_patches import compile_ram_patches
+from hackatari.rewards import RewardFunction
+from hackatari.objects import ObjectArrays
+from hackatari.extraction import extraction_addresses, _RecordingRAM
+from hackatari.profiling import PhaseProfiler
+from hackatari.rng import ModificationRNG
+from hackatari.registry import describe, unknown_modifications
 import warnings
-import cv2
+
+
+# Snapshot of a HackAtari environment, see HackAtari.clone_full_state
+FullState = namedtuple("FullState", [
+    "ale", "random", "modif_rng", "modifications", "reward", "org_return", "org_reward", "objects", "buffers"])
 
 # Suppress unnecessary warnings
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 warnings.filterwarnings("ignore", category=UserWarning)
 
 
+def _copy_object(obj):
+    """
+    Shallow copy of a game object (faster than copy.copy, the attributes are immutable values).
+    """
+    clone = object.__new__(obj.__class__)
+    clone.__dict__.update(obj.__dict__)
+    return clone
+
+
 class HackAtari(OCAtari):
     """
     HackAtari extends the Atari Learning Environment (ALE) by enabling object-centric observations
     and providing various environment modifications.
     """
 
+    # Start states of the reset cache, keyed by configuration and seed (see reset)
+    _reset_cache = {}
+
     def __init__(
         self,
         env_name: str,
@@ -38,10 +63,27 @@ class HackAtari(OCAtari):
         :param dopamine_pooling: Whether to use Dopamine-style frame pooling
         :param game_mode: Specific mode setting for the ALE
         :param difficulty: Difficulty level for the ALE
+
+        The keyword argument ``lean_frameskip`` (default False) makes the intermediate frames of a
+        step lean: they only run the RAM modifications and the emulator, without rendering the
+        screen, extracting objects or filling the observation buffers.
+        The keyword argument ``reset_cache`` (default 0) enables the start-state cache of ``reset``,
+        with a pool of that many start states for unseeded resets and the start states of that many
+        most recently used seeds.
+        The keyword argument ``profile`` (default False) times every phase of ``step`` and ``reset``
+        into ``self.profiler`` (see ``hackatari.profiling``).
+        The keyword argument ``incremental_extraction`` (default False) skips the object extraction
+        of the steps where none of the RAM bytes read by the last extraction changed, in
+        ``mode="ram"``. It first checks the extractor of the game with a rollout on a second
+        environment, once per process (see ``hackatari.extraction``).
         """
         self._frameskip = kwargs.get("frameskip", 4)  # Default frameskip to 4
         # Override frameskip to 1 for custom step handling
         kwargs["frameskip"] = 1
+        lean_frameskip = kwargs.pop("lean_frameskip", False)
+        reset_cache = kwargs.pop("reset_cache", 0)
+        profile = kwargs.pop("profile", False)
+        incremental_extraction = kwargs.pop("incremental_extraction", False)
 
         super().__init__(env_name, *args, **kwargs)
 
@@ -49,34 +91,91 @@ class HackAtari(OCAtari):
         self.step_modifs, self.reset_modifs, self.post_detection_modifs = [], [], []
         
 
+        # Generator of the stochastic modifications, reseeded by reset(seed=...)
+        self.modif_rng = ModificationRNG()
+
+        unknown = unknown_modifications(self.game_name, modifs)
+        if unknown:
+            print(f"Unknown modifications for {self.game_name}: {unknown}")
+
         # Load modification functions dynamically
         modif_module = importlib.import_module(
             f"hackatari.games.{self.game_name.lower()}")
         step_modifs, reset_modifs, post_detection_modifs = modif_module.modif_funcs(
             self, modifs)
 
+        # Objects holding the state of the modifications, captured by clone_full_state
+        self._modif_handlers = []
+        for func in step_modifs + reset_modifs + post_detection_modifs:
+            handler = getattr(func, "__self__", None)
+            if handler is not None and all(handler is not h for h in self._modif_handlers):
+                self._modif_handlers.append(handler)
+
+        # Modifications declared as RAM patches are compiled into a single plan,
+        # only the remaining (stateful) ones are called one by one
+        self.ram_patches, step_modifs = compile_ram_patches(step_modifs)
         self.step_modifs.extend(step_modifs)
         self.reset_modifs.extend(reset_modifs)
         self.post_detection_modifs.extend(post_detection_modifs)
 
         self.dopamine_pooling = dopamine_pooling and self._frameskip > 1
+        if self.dopamine_pooling:
+            # Persistent buffers for the penultimate frame, which is max-pooled with the last one
+            height, width = self._ale.getScreenDims()
+            self._pool_rgb = np.empty((height, width, 3), dtype=np.uint8)
+            self._pool_gray_full = np.empty((height, width), dtype=np.uint8)
+            self._pool_gray = np.empty((84, 84), dtype=np.uint8)
+            # cv2 functions are looked up once, the capture runs at every step
+            import cv2
+            self._cvt_color, self._resize = cv2.cvtColor, cv2.resize
+            self._rgb2gray, self._inter_area = cv2.COLOR_RGB2GRAY, cv2.INTER_AREA
+        # Lean intermediate frames act on the ALE directly, which needs discrete actions
+        self.lean_frameskip = lean_frameskip and not self._env.unwrapped.continuous
+        self._action_set = self._env.unwrapped._action_set
+        self._ale_act = self._ale.act
+
+        # Start states are shared between the environments with the same configuration
+        self.reset_cache = reset_cache
+        self._reset_cache_key = (
+            self.game_name, tuple(modifs), game_mode, difficulty, self.mode, self.obs_mode,
+            self.hud, self._frameskip, kwargs.get("repeat_action_probability"),
+            kwargs.get("full_action_space"), self.buffer_window_size, self.create_rgb_stack,
+            self.create_dqn_stack, self.create_ns_stack)
+
+        # RAM snapshot shared by all step modifications of a sub-step (see get_ram/set_ram)
+        self._ram_snapshot = None
+        self._ram_snapshot_shared = False
+        self._ram_dirty = np.zeros(128, dtype=bool)
+
+        # Array view of the objects, built on first access and refreshed when stale
+        self._object_arrays = None
+        self._object_arrays_stale = True
 
         # Track original rewards for external reward adjustments
         self.org_return = 0
         self.org_reward = 0
 
         # Load custom reward function if provided
+        self.new_reward_func = None
         if rewardfunc_path:
             print(f"Changed reward function to {rewardfunc_path}")
-            spec = importlib.util.spec_from_file_location(
-                "reward_function", rewardfunc_path)
-            module = importlib.util.module_from_spec(spec)
-            sys.modules["reward_function"] = module
-            spec.loader.exec_module(module)
-            self.new_reward_func = module.reward_function
+            self.new_reward_func = RewardFunction(rewardfunc_path)
             self._step = self.step  # Override step function
             self.step = self.step_with_lm_reward  # Override step function
 
+        # RAM addresses read by the last object extraction and their values then
+        self._extraction_addresses = None
+        self._extraction_values = None
+        if incremental_extraction and self.mode == "ram" \
+                and extraction_addresses(self.game_name, modifs, self.hud) is not None:
+            self._extract = sys.modules[
+                f"ocatari.ram.{self.game_name.lower()}"]._detect_objects_ram
+            self.detect_objects = self._detect_objects_incremental
+
+        self.profiler = None
+        if profile:
+            self._enable_profiling()
+
         # Apply game mode and difficulty settings
         try:
             self.env.env.ale.setMode(game_mode)
@@ -99,53 +198,198 @@ class HackAtari(OCAtari):
         frameskip = self._frameskip
         total_reward = 0.0
         terminated = truncated = False
-        if self.dopamine_pooling:
-            last_two_obs = []
-            last_two_org = []
+
+        if self.lean_frameskip:
+            ale = self._ale
+            ale_act = self._ale_act
+            ale_action = self._action_set[args[0] if args else kwargs["action"]]
 
         for i in range(frameskip-1):
-            for func in self.step_modifs:
-                func()
-            obs, reward, terminated, truncated, info = self._env.step(
-                *args, **kwargs)
+            self._apply_step_modifs()
+            if self.lean_frameskip:
+                # Intermediate frame: emulation only, nothing is rendered or detected
+                reward = ale_act(ale_action)
+                terminated = ale.game_over(with_truncation=False)
+                truncated = ale.game_truncated()
+            else:
+                obs, reward, terminated, truncated, info = self._env.step(
+                    *args, **kwargs)
             total_reward += float(reward)
             if terminated or truncated:
                 break
 
         if self.dopamine_pooling:
-            last_two_obs.append(cv2.resize(cv2.cvtColor(self.getScreenRGB(
-            ), cv2.COLOR_RGB2GRAY), (84, 84), interpolation=cv2.INTER_AREA))
-            last_two_org.append(self.getScreenRGB())
+            self._capture_pooling_frame()
 
-        for func in self.step_modifs:
-            func()
+        self._apply_step_modifs()
         obs, reward, terminated, truncated, info = super().step(
             *args, **kwargs)
         total_reward += float(reward)
-        for func in self.post_detection_modifs:
-            func()
+        self._object_arrays_stale = True
+        self._apply_post_detection_modifs()
+        self._object_arrays_stale = True
 
         if self.dopamine_pooling:
-            last_two_obs.append(cv2.resize(cv2.cvtColor(self.getScreenRGB(
-            ), cv2.COLOR_RGB2GRAY), (84, 84), interpolation=cv2.INTER_AREA))
-            last_two_org.append(self.getScreenRGB())
+            obs = self._pool_last_frames(obs)
 
-        if self.dopamine_pooling:
-            merged_obs = np.maximum.reduce(last_two_obs)
-            merged_org = np.maximum.reduce(last_two_org)
+        return obs, total_reward, terminated, truncated, info
+
+    def _capture_pooling_frame(self):
+        """
+        Store the penultimate frame of a step into the pooling buffers.
+        """
+        self._ale.getScreenRGB(self._pool_rgb)
+        if self.create_dqn_stack:
+            self._cvt_color(self._pool_rgb, self._rgb2gray, dst=self._pool_gray_full)
+            self._resize(self._pool_gray_full, (84, 84), dst=self._pool_gray,
+                         interpolation=self._inter_area)
 
-            if self.create_dqn_stack:
-                self._state_buffer_dqn[-1] = merged_obs
-            if self.create_rgb_stack:
-                self._state_buffer_rgb[-1] = merged_org
+    def _pool_last_frames(self, obs):
+        """
+        Max-pool the penultimate frame into the last one, in place in the observation buffers.
 
+        :param obs: Observation returned by the last sub-step
+        :return: The pooled observation
+        """
+        if self.create_dqn_stack:
+            last_dqn = self._state_buffer_dqn[-1]
+            np.maximum(self._pool_gray, last_dqn, out=last_dqn)
             if self.obs_mode == "dqn":
-                obs[-1] = merged_obs
-            else:
-                # dopamine pooling works with either "dqn" or "ori" obs_mode.
-                obs = merged_org
+                obs[-1] = last_dqn
+        if self.create_rgb_stack:
+            last_rgb = self._state_buffer_rgb[-1]
+            np.maximum(self._pool_rgb, last_rgb, out=last_rgb)
+            if self.obs_mode != "dqn":
+                obs = last_rgb
+        elif self.obs_mode != "dqn":
+            # dopamine pooling works with either "dqn" or "ori" obs_mode.
+            np.maximum(self._pool_rgb, obs, out=obs)
+        return obs
+
+    def _apply_step_modifs(self):
+        """
+        Apply the compiled RAM patches and the step modifications before an emulation sub-step.
 
-        return obs, total_reward, terminated, truncated, info
+        The RAM is read once: every modification gets the same snapshot from ``get_ram``, writes go
+        to the snapshot and are marked in a dirty mask, and only the dirty addresses are written
+        back to the emulator once all modifications ran.
+        """
+        if not (self.step_modifs or self.ram_patches.needs_ram):
+            if self.ram_patches:
+                self.ram_patches.write(self._ale)
+            return
+
+        dirty = self._ram_dirty
+        dirty[:] = False
+        ram = self._ale.getRAM()
+        if self.ram_patches:
+            self.ram_patches.apply(ram, dirty)
+        self._ram_snapshot = ram
+        self._ram_snapshot_shared = False
+        try:
+            for func in self.step_modifs:
+                func()
+        finally:
+            ram = self._ram_snapshot
+            self._ram_snapshot = None
+            set_ram = self._ale.setRAM
+            for address in np.flatnonzero(dirty):
+                set_ram(int(address), int(ram[address]))
+
+    def _apply_post_detection_modifs(self):
+        """
+        Apply the modifications that run after the objects of a step are detected.
+        """
+        for func in self.post_detection_modifs:
+            func()
+
+    def _detect_objects_incremental(self):
+        """
+        RAM object extraction, skipped when the bytes read by the last extraction are the same: the
+        extractor would read the same values along the same path, so the objects are the same and
+        only their previous positions move on. Every extraction records the addresses it reads.
+        """
+        ram = self._ale.getRAM()
+        for obj in self.objects:
+            if obj:
+                obj._save_prev()
+        addresses = self._extraction_addresses
+        if addresses is not None and ram[addresses].tobytes() == self._extraction_values:
+            return
+        recording = _RecordingRAM(ram)
+        self._extract(self.objects, recording, self.hud)
+        if recording.whole:
+            # The extractor used the RAM as a whole, the next step extracts again
+            self._extraction_addresses = None
+        else:
+            addresses = np.fromiter(recording.read, dtype=np.intp, count=len(recording.read))
+            self._extraction_addresses = addresses
+            self._extraction_values = ram[addresses].tobytes()
+
+    def _enable_profiling(self):
+        """
+        Wrap the callables of every phase of step and reset on this instance, so that their calls
+        are timed by ``self.profiler``.
+        """
+        profiler = self.profiler = PhaseProfiler()
+        timed = profiler.timed
+        for phase, modifs in (("step", self.step_modifs), ("reset", self.reset_modifs),
+                              ("post_detection", self.post_detection_modifs)):
+            modifs[:] = [timed(f"{phase}:{func.__name__}", func) for func in modifs]
+        self._apply_step_modifs = timed("step_modifications", self._apply_step_modifs)
+        self._apply_post_detection_modifs = timed(
+            "post_detection_modifications", self._apply_post_detection_modifs)
+        self._env.step = timed("emulation", self._env.step)
+        self._ale_act = timed("emulation", self._ale_act)
+        self.detect_objects = timed("object_detection", self.detect_objects)
+        self._fill_buffer = timed("buffers", self._fill_buffer)
+        if self.dopamine_pooling:
+            self._capture_pooling_frame = timed("pooling", self._capture_pooling_frame)
+            self._pool_last_frames = timed("pooling", self._pool_last_frames)
+        if self.new_reward_func is not None:
+            self.new_reward_func._function = timed("reward", self.new_reward_func._function)
+        self.step = timed("step", self.step)
+        self.reset = timed("reset", self.reset)
+
+    @property
+    def object_arrays(self):
+        """
+        The current objects as arrays, one entry per object slot (see ``hackatari.objects``). The
+        arrays are updated in place on the first access after every step or reset.
+        """
+        if self._object_arrays is None:
+            self._object_arrays = ObjectArrays(self)
+        if self._object_arrays_stale:
+            self._object_arrays.update()
+            self._object_arrays_stale = False
+        return self._object_arrays
+
+    def get_ram(self):
+        """
+        Returns the RAM state. During the step modifications, this is the shared RAM snapshot of
+        the current sub-step, including the writes done so far.
+        """
+        if self._ram_snapshot is None:
+            return self._ale.getRAM()
+        self._ram_snapshot_shared = True
+        return self._ram_snapshot
+
+    def set_ram(self, target_ram_position, new_value):
+        """
+        Directly set a given value at a targeted RAM position. During the step modifications, the
+        value is written to the RAM snapshot and flushed to the emulator after the last modification.
+        """
+        if self._ram_snapshot is None:
+            return self._ale.setRAM(target_ram_position, new_value)
+        value = operator.index(new_value)
+        if not 0 <= value <= 255:
+            raise TypeError(f"RAM values have to be in [0, 255], got {new_value}")
+        if self._ram_snapshot_shared:
+            # Copy on write: arrays previously returned by get_ram keep their content
+            self._ram_snapshot = self._ram_snapshot.copy()
+            self._ram_snapshot_shared = False
+        self._ram_snapshot[target_ram_position] = value
+        self._ram_dirty[target_ram_position] = True
 
     def step_with_lm_reward(self, action):
         """
@@ -165,18 +409,132 @@ class HackAtari(OCAtari):
     def reset(self, *args, **kwargs):
         """
         Reset the environment and apply reset modifications.
+
+        With ``reset_cache`` enabled, the start state reached after the reset modifications is
+        snapshotted and later resets restore a snapshot instead of running the reset again. A
+        seeded reset always restores the start state of its seed, with the emulator RNG of a real
+        reset with that seed; the start states of the ``reset_cache`` most recently used seeds are
+        kept. Unseeded resets fill a pool of ``reset_cache`` start states, then restore one of them
+        picked at random, keeping the current emulator RNG, ``random`` and ``modif_rng`` streams
+        so that the episodes still differ.
+
+        A seeded reset also reseeds ``modif_rng``, the generator of the stochastic modifications
+        (see ``hackatari.rng``).
         """
+        if self.reset_cache and not args and getattr(self._env, "has_reset", True):
+            return self._cached_reset(kwargs.get("seed"))
+        return self._reset(*args, **kwargs)
+
+    def _reset(self, *args, **kwargs):
+        # The reset replaces the objects, which are always extracted again
+        self._extraction_addresses = None
+        if kwargs.get("seed") is not None:
+            self.modif_rng.seed(kwargs["seed"])
         obs, info = super().reset(*args, **kwargs)
         self.org_reward = 0
         self.org_return = 0
+        if self.new_reward_func is not None:
+            self.new_reward_func.reset()
 
+        self._object_arrays_stale = True
         for func in self.reset_modifs:
             func()
         for func in self.post_detection_modifs:
             func()
+        self._object_arrays_stale = True
 
         return obs, info
 
+    def _cached_reset(self, seed=None):
+        # Unseeded start states, and seed -> start state in least recently used order
+        pool, seeded = HackAtari._reset_cache.setdefault(
+            self._reset_cache_key, ([], OrderedDict()))
+        if seed is not None and seed in seeded:
+            seeded.move_to_end(seed)
+            # Seeds the generators of the gymnasium environment as a real reset would
+            self._env.unwrapped.seed_game(seed)
+            state, obs, info = seeded[seed]
+        elif seed is not None or len(pool) < self.reset_cache:
+            obs, info = self._reset(seed=seed)
+            state = self.clone_full_state()._replace(random=None, reward=None)
+            if seed is None:
+                # Unseeded snapshots leave the emulator and modification RNGs as they are when
+                # restored
+                state = state._replace(ale=self._ale.cloneState(include_rng=False),
+                                       modif_rng=None)
+                pool.append((state, np.array(obs), dict(info)))
+            else:
+                seeded[seed] = (state, np.array(obs), dict(info))
+                while len(seeded) > self.reset_cache:
+                    seeded.popitem(last=False)
+            return obs, info
+        else:
+            state, obs, info = random.choice(pool)
+        self.restore_full_state(state)
+        if self.new_reward_func is not None:
+            self.new_reward_func.reset()
+        return np.array(obs), dict(info)
+
+    @classmethod
+    def clear_reset_cache(cls):
+        """
+        Drop all the start states stored by the reset cache.
+        """
+        cls._reset_cache.clear()
+
+    def clone_full_state(self):
+        """
+        Returns a snapshot of the whole state of the environment: the emulator state (with its
+        random generator), the state of the modifications, of the custom reward, of the
+        ``random`` module and of ``modif_rng``, the returns, the detected objects and the
+        observation buffers. Stepping after ``restore_full_state`` continues exactly as it would
+        have from the moment of the snapshot.
+
+        :return: A ``FullState`` tuple, which can be pickled
+        """
+        return FullState(
+            ale=self._ale.cloneState(include_rng=True),
+            random=random.getstate(),
+            modif_rng=self.modif_rng.get_state(),
+            modifications=[copy.deepcopy({k: v for k, v in vars(handler).items() if k != "env"})
+                           for handler in self._modif_handlers],
+            reward=self.new_reward_func.get_state() if self.new_reward_func is not None else None,
+            org_return=self.org_return,
+            org_reward=self.org_reward,
+            # Objects are updated in place by the detection, buffered observations are not
+            objects=[_copy_object(obj) for obj in self.objects],
+            buffers=[list(buffer) if buffer is not None else None for buffer in self._buffers()],
+        )
+
+    def restore_full_state(self, state):
+        """
+        Restores a snapshot returned by ``clone_full_state``. The same snapshot can be restored
+        any number of times.
+
+        :param state: A ``FullState`` of an environment with the same game and modifications
+        """
+        self._ale.restoreState(state.ale)
+        if state.random is not None:
+            random.setstate(state.random)
+        if state.modif_rng is not None:
+            self.modif_rng.set_state(state.modif_rng)
+        for handler, handler_state in zip(self._modif_handlers, state.modifications):
+            vars(handler).update(copy.deepcopy(handler_state))
+        if self.new_reward_func is not None and state.reward is not None:
+            self.new_reward_func.set_state(state.reward)
+        self.org_return = state.org_return
+        self.org_reward = state.org_reward
+        self.objects[:] = [_copy_object(obj) for obj in state.objects]
+        self._object_arrays_stale = True
+        self._extraction_addresses = None
+        for buffer, content in zip(self._buffers(), state.buffers):
+            if buffer is not None:
+                buffer.clear()
+                buffer.extend(content)
+
+    def _buffers(self):
+        return self._state_buffer_rgb, self._state_buffer_dqn, self._state_buffer_ns
+
     @property
     def available_modifications(self):
         return _available_modifications(self.game_name)
@@ -211,6 +569,7 @@ class HumanPlayable(HackAtari):
         """
         Start the game loop, allowing human interaction.
         """
+        import pygame
         pygame.init()
         self.running = True
 
@@ -244,6 +603,7 @@ class HumanPlayable(HackAtari):
         """
         _handle_user_input: Handles user input for the BoxingExtendedHuman environment.
         """
+        import pygame
         self.current_mouse_pos = np.asarray(pygame.mouse.get_pos())
 
         events = pygame.event.get()
@@ -270,11 +630,4 @@ class HumanPlayable(HackAtari):
     
 
 def _available_modifications(game_name):
-    modif_module = importlib.import_module(
-            f"hackatari.games.{game_name.lower()}")
-    modifs_list = [mod for mod in dir(modif_module.GameModifications) if not mod.startswith("_")]
-    retstr = f"Available modifications for {game_name}:\n"
-    for mod in modifs_list:
-        retstr += f"  * {mod}:\n\t"
-        retstr += getattr(modif_module.GameModifications, mod).__doc__.strip() + "\n"
-    return retstr
\ No newline at end of file
+    return describe(game_name)
@@ -0,0 +1,159 @@
+"""
+Incremental RAM object extraction.
+
+In ``mode="ram"``, OCAtari derives the objects of a step from the RAM with the extractor of the
+game, a function of the RAM bytes it reads (and of the objects of the previous step). With
+``HackAtari(..., incremental_extraction=True)``, every extraction runs on a recording RAM, and the
+extraction of the next step is skipped when the addresses read by the last extraction hold the
+same values. Any change of a byte the extractor looked at extracts again, so the objects are
+exactly those of a full extraction; only their previous positions move forward (their ``dx`` and
+``dy`` become 0).
+
+The limits are plain: the extractors of the games are single functions over all the objects, so a
+step either extracts all the objects or none, there are no per-object updates. The gain depends on
+how often the whole read set stays unchanged: e.g. Kangaroo and Tennis skip about 40% of the
+extractions, Pong, Breakout and Asterix about 1%, Boxing and Freeway none, while the recording
+costs a few microseconds per extraction.
+
+Skipping is only exact for extractors that are a pure function of the bytes they read.
+``extraction_addresses`` checks this once per process for every game, modifications and ``hud``,
+by extracting twice from the same RAM along a random rollout on a second environment (about one to
+two seconds). The check only runs when ``incremental_extraction=True`` is given. Games whose
+extractor keeps state between calls (e.g. MsPacman, Amidar, FishingDerby) or reads the RAM as a
+whole always extract (``extraction_addresses`` returns None).
+"""
+import copy
+import random
+import sys
+
+import numpy as np
+
+
+class _RecordingRAM:
+    """
+    RAM given to an extractor, recording the addresses it reads.
+    """
+
+    def __init__(self, ram):
+        self.ram = ram
+        self.read = set()
+        self.whole = False
+
+    def __getitem__(self, key):
+        if type(key) is int:
+            self.read.add(key)
+        elif isinstance(key, slice):
+            self.read.update(range(*key.indices(len(self.ram))))
+        else:
+            self.read.update(np.arange(len(self.ram))[key].ravel().tolist())
+        return self.ram[key]
+
+    def __len__(self):
+        return len(self.ram)
+
+    def __iter__(self):
+        self.whole = True
+        return iter(self.ram)
+
+    def __array__(self, dtype=None, copy=None):
+        self.whole = True
+        return np.asarray(self.ram, dtype=dtype)
+
+    def __getattr__(self, name):
+        # Any other use of the RAM (comparisons, numpy methods, ...) reads all of it
+        self.whole = True
+        return getattr(self.ram, name)
+
+
+def _signature(objects):
+    """
+    The classes and attributes of the objects, without their previous positions. Empty slots
+    (``NoObject``) are only compared by class.
+    """
+    return [(obj.__class__, {k: v for k, v in vars(obj).items() if k != "_prev_xy"}
+             if obj.category != "NoObject" else {})
+            for obj in objects]
+
+
+def _same_objects(a, b):
+    for (cls_a, attributes_a), (cls_b, attributes_b) in zip(a, b):
+        if cls_a is not cls_b or attributes_a.keys() != attributes_b.keys():
+            return False
+        for key, value in attributes_a.items():
+            if not np.array_equal(value, attributes_b[key]):
+                return False
+    return len(a) == len(b)
+
+
+# (game, modifications, hud) -> addresses read by the extractor, or None
+_addresses = {}
+
+
+def extraction_addresses(game_name, modifs=(), hud=False, steps=500, seed=0):
+    """
+    Returns the RAM addresses read by the object extractor of a game, recorded along a random
+    rollout of ``steps`` steps, or None if the extractor is not a pure function of these bytes.
+    The result is computed once per process for every game, modifications and ``hud``.
+
+    :param game_name: Name of the game
+    :param modifs: Modifications of the environments the addresses are used for
+    :param hud: Whether the HUD objects are extracted
+    :return: Sorted array of RAM addresses, or None if skipping the extraction is not exact for
+        this game
+    """
+    key = (game_name, tuple(modifs), hud)
+    if key not in _addresses:
+        random_state = random.getstate()
+        try:
+            _addresses[key] = _record_addresses(game_name, modifs, hud, steps, seed)
+        finally:
+            random.setstate(random_state)
+    return _addresses[key]
+
+
+def _record_addresses(game_name, modifs, hud, steps, seed):
+    from hackatari.core import HackAtari
+
+    env = HackAtari(game_name, list(modifs), mode="ram", hud=hud)
+    extract = sys.modules[f"ocatari.ram.{env.game_name.lower()}"]._detect_objects_ram
+    read = set()
+    exact = True
+
+    def detect_objects():
+        nonlocal exact
+        if not exact:
+            return
+        objects = env.objects
+        for obj in objects:
+            if obj:
+                obj._save_prev()
+        ram = env._ale.getRAM()
+        recording = _RecordingRAM(ram)
+        try:
+            extract(objects, recording, hud)
+        except TypeError:
+            # The extractor uses the RAM in a way the recording does not support
+            exact = False
+            return
+        read.update(recording.read)
+        # Extracting again from the same RAM has to give the same objects
+        again = copy.deepcopy(objects)
+        extract(again, ram, hud)
+        if recording.whole or not _same_objects(_signature(objects), _signature(again)):
+            exact = False
+
+    env.detect_objects = detect_objects
+    try:
+        env.action_space.seed(seed)
+        env.reset(seed=seed)
+        for _ in range(steps):
+            _, _, terminated, truncated, _ = env.step(env.action_space.sample())
+            if not exact:
+                break
+            if terminated or truncated:
+                env.reset()
+    finally:
+        env.close()
+    if not exact:
+        return None
+    return np.array(sorted(read), dtype=np.intp)
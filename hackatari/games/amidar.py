@@ -1,3 +1,6 @@
+from hackatari.ram_patches import RamPatch, ram_patch
+
+
 class GameModifications:
     """
     Encapsulates game modifications for managing active modifications and applying them.
@@ -12,23 +15,19 @@ class GameModifications:
         self.env = env
         self.active_modifications = set()
 
+    @ram_patch(*[RamPatch(masked={73 + i: (16, 16)}, when=[(73 + i, "&", 32)])
+                 for i in range(7)])
     def change_enemies(self):
         """
         Changes the enemies to the second version.
         """
-        ram = self.env.get_ram()
-        for i in range(7):
-            if ram[73 + i] & 32:
-                self.env.set_ram(73 + i, ram[73 + i] | 16)
 
+    @ram_patch(*[RamPatch(masked={73 + i: (16, 16)}, when=[(73 + i, "!&", 32)])
+                 for i in range(7)])
     def change_player(self):
         """
         Changes the player to the second version.
         """
-        ram = self.env.get_ram()
-        for i in range(7):
-            if not ram[73 + i] & 32:
-                self.env.set_ram(73 + i, ram[73 + i] | 16)
 
     def _set_active_modifications(self, active_modifs):
         """
@@ -1,6 +1,3 @@
-import random
-
-
 # Warning: Doesn't work right now.
 
 
@@ -21,9 +18,9 @@ class GameModifications:
         """
         mother ship changes color randomly
         """
-        if random.random() < 0.01:
-            self.env.set_ram(11, random.randint(0, 240))
-            self.env.set_ram(12, random.randint(0, 240))
+        if self.env.modif_rng.random() < 0.01:
+            self.env.set_ram(11, self.env.modif_rng.randint(0, 240))
+            self.env.set_ram(12, self.env.modif_rng.randint(0, 240))
 
     def player_missle(self):
         """
@@ -33,10 +30,10 @@ class GameModifications:
         missle_y = ram[67]
         
         # randomly change it to speeding up or slowing down the missle
-        if random.random() < 0.01:
+        if self.env.modif_rng.random() < 0.01:
             self.speed_sign = self.speed_sign * -1
 
-        if missle_y != 127 and random.random() < 0.1:
+        if missle_y != 127 and self.env.modif_rng.random() < 0.1:
             new_missle_y = missle_y + 7 * self.speed_sign
             new_missle_y = max(0, min(255, new_missle_y))
             self.env.set_ram(67, new_missle_y)
@@ -45,8 +42,8 @@ class GameModifications:
         """
         randomly makes enemies change color
         """
-        if random.random() < 0.1:
-            p = random.random()
+        if self.env.modif_rng.random() < 0.1:
+            p = self.env.modif_rng.random()
             if p<0.33:
                 self.env.set_ram(40, 196)
             elif 0.33<p<0.66:
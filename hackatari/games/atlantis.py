@@ -1,6 +1,3 @@
-import random
-
-
 class GameModifications:
     """
     Encapsulates game modifications for managing active modifications and applying them.
@@ -42,7 +39,7 @@ class GameModifications:
         types = [32, 64, 80]
         for i in range(4):
             if ram[79 + i] and ram[79 + i] < 81:
-                enemy = random.choice(types)
+                enemy = self.env.modif_rng.choice(types)
                 self.env.set_ram(79 + i, enemy)
                 if enemy < 80:
                     if ram[75 + i] == 2:
@@ -1,6 +1,3 @@
-import random
-
-
 class GameModifications:
     """
     Encapsulates game modifications for managing active modifications and applying them.
@@ -15,8 +12,8 @@ class GameModifications:
         self.env = env
         self.active_modifications = set()
         self.towns_visited = []
+        # Shuffled by random_city_res, once the generator is seeded by the reset
         self.remaining_towns = [i for i in range(256)]
-        random.shuffle(self.remaining_towns)
         self.current_town = 0
         self.player_x = 0
 
@@ -55,20 +52,20 @@ class GameModifications:
             self.current_town = picked_city
             if len(self.remaining_towns) == 0:  # reset
                 self.remaining_towns = [i for i in range(256)]
-                random.shuffle(self.remaining_towns)
+                self.env.modif_rng.shuffle(self.remaining_towns)
             self.towns_visited.append(picked_city)
             self.env.set_ram(0, picked_city)
 
-    # def random_city_res(self):
-    #     """
-    #     Resets the city randomizer.
-    #     """
-    #     self.remaining_towns = [i for i in range(256)]
-    #     random.shuffle(self.remaining_towns)
-    #     picked_city = self.remaining_towns.pop(0)
-    #     self.current_town = picked_city
-    #     self.towns_visited.append(picked_city)
-    #     self.env.set_ram(0, picked_city)
+    def random_city_res(self):
+        """
+        Resets the city randomizer.
+        """
+        self.remaining_towns = [i for i in range(256)]
+        self.env.modif_rng.shuffle(self.remaining_towns)
+        picked_city = self.remaining_towns.pop(0)
+        self.current_town = picked_city
+        self.towns_visited.append(picked_city)
+        self.env.set_ram(0, picked_city)
 
     def revisit_city(self):
         """
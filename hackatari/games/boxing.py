@@ -1,4 +1,4 @@
-import random
+from hackatari.ram_patches import ram_patch
 
 
 class GameModifications:
@@ -6,6 +6,8 @@ class GameModifications:
     Encapsulates game modifications for managing active modifications and applying them.
     """
 
+    COLORS = [0, 12, 48, 113, 200]  # Black, White, Red, Blue, Green
+
     def __init__(self, env):
         """
         Initializes the modification handler with the given environment.
@@ -18,13 +20,15 @@ class GameModifications:
         self.player_color = 0  # Black, Red, Blue, Green
         self.enemy_color = 0  # White, Red, Blue, Green
         self.once = 0
-        self.colors = [0, 12, 48, 113, 200]
+        self.colors = list(self.COLORS)
+        self.timer = 0
+        self.counter = 0
 
+    @ram_patch(writes={101: 128})
     def one_armed(self):
         """
         Disables the "hitting motion" with the right arm permanently.
         """
-        self.env.set_ram(101, 128)
 
     def gravity(self):
         """
@@ -32,10 +36,10 @@ class GameModifications:
         """
         curr_player_pos = self.env.get_ram()[34]
         if curr_player_pos < 87:
-            if not self.env.timer % self.gravity_level:
+            if not self.timer % self.gravity_level:
                 curr_player_pos += 1
                 self.env.set_ram(34, curr_player_pos)
-        self.env.timer += 1
+        self.timer += 1
 
     def offensive(self):
         """
@@ -82,13 +86,12 @@ class GameModifications:
         """
         Applies random movements to the player's input.
         """
-        r = random.randint(0, 1)
+        r = self.env.modif_rng.randint(0, 1)
         if r == 0:
-            self.env.counter = getattr(self.env, "counter", 0)
-            do = self.env.counter % 4
-            self.env.counter += 1
+            do = self.counter % 4
+            self.counter += 1
         else:
-            do = random.randint(0, 3)
+            do = self.env.modif_rng.randint(0, 3)
 
         if do == 0:
             self.offensive()
@@ -99,65 +102,65 @@ class GameModifications:
         elif do == 3:
             self.down()
 
+    @ram_patch(writes={1: COLORS[0]})
     def color_player_black(self):
         """
         Changes the player's color to black.
         """
-        self.env.set_ram(1, self.colors[0])
 
+    @ram_patch(writes={1: COLORS[1]})
     def color_player_white(self):
         """
         Changes the player's color to white.
         """
-        self.env.set_ram(1, self.colors[1])
 
+    @ram_patch(writes={1: COLORS[2]})
     def color_player_red(self):
         """
         Changes the player's color to red.
         """
-        self.env.set_ram(1, self.colors[2])
 
+    @ram_patch(writes={1: COLORS[3]})
     def color_player_blue(self):
         """
         Changes the player's color to blue.
         """
-        self.env.set_ram(1, self.colors[3])
 
+    @ram_patch(writes={1: COLORS[4]})
     def color_player_green(self):
         """
         Changes the player's color to green.
         """
-        self.env.set_ram(1, self.colors[4])
 
+    @ram_patch(writes={2: COLORS[0]})
     def color_enemy_black(self):
         """
         Changes the enemy's color to black.
         """
-        self.env.set_ram(2, self.colors[0])
 
+    @ram_patch(writes={2: COLORS[1]})
     def color_enemy_white(self):
         """
         Changes the enemy's color to white.
         """
-        self.env.set_ram(2, self.colors[1])
 
+    @ram_patch(writes={2: COLORS[2]})
     def color_enemy_red(self):
         """
         Changes the enemy's color to red.
         """
-        self.env.set_ram(2, self.colors[2])
 
+    @ram_patch(writes={2: COLORS[3]})
     def color_enemy_blue(self):
         """
         Changes the enemy's color to blue.
         """
-        self.env.set_ram(2, self.colors[3])
 
+    @ram_patch(writes={2: COLORS[4]})
     def color_enemy_green(self):
         """
         Changes the enemy's color to green.
         """
-        self.env.set_ram(2, self.colors[4])
 
     def switch_positions(self):
         """
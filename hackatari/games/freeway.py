@@ -1,4 +1,4 @@
-import random
+from hackatari.ram_patches import ram_patch
 
 
 class GameModifications:
@@ -21,80 +21,71 @@ class GameModifications:
         """
         Stops a random car with a biased probability.
         """
-        counter = random.choices([0, 1, 2, 3], weights=[
+        counter = self.env.modif_rng.choices([0, 1, 2, 3], weights=[
                                  0.1, 0.3, 0.3, 0.3], k=1)[0]
-        random_car = random.randint(33, 42)
+        random_car = self.env.modif_rng.randint(33, 42)
         self.env.set_ram(random_car, 100 if counter > 0 else 0)
 
     def align_all_cars(self):
         """
         Stops all cars based on a biased random decision.
         """
-        car_all = random.choices([0, 1], weights=[0.6, 0.4], k=1)[0]
+        car_all = self.env.modif_rng.choices([0, 1], weights=[0.6, 0.4], k=1)[0]
         for car_pos in range(33, 43):
             self.env.set_ram(car_pos, 100 if car_all > 0 else 0)
 
+    @ram_patch(writes={**dict.fromkeys(range(33, 43), 100),
+                       **dict.fromkeys(range(108, 113), 15),
+                       **dict.fromkeys(range(113, 118), 150)})
     def stop_all_cars(self):
         """
         Stops all cars and repositions some to predefined positions.
         """
-        for car_stop in range(33, 43):
-            self.env.set_ram(car_stop, 100)
-        for new_pos_down in range(108, 113):
-            self.env.set_ram(new_pos_down, 15)
-        for new_pos_down in range(113, 118):
-            self.env.set_ram(new_pos_down, 150)
 
+    @ram_patch(writes=dict.fromkeys(range(77, 87), 0))
     def all_black_cars(self):
         """
         Colors all cars black.
         """
-        for car in range(77, 87):
-            self.env.set_ram(car, 0)
 
+    @ram_patch(writes=dict.fromkeys(range(77, 87), 15))
     def all_white_cars(self):
         """
         Colors all cars white.
         """
-        for car in range(77, 87):
-            self.env.set_ram(car, 15)
 
+    @ram_patch(writes=dict.fromkeys(range(77, 87), 66))
     def all_red_cars(self):
         """
         Colors all cars red.
         """
-        for car in range(77, 87):
-            self.env.set_ram(car, 66)
 
+    @ram_patch(writes=dict.fromkeys(range(77, 87), 210))
     def all_green_cars(self):
         """
         Colors all cars green.
         """
-        for car in range(77, 87):
-            self.env.set_ram(car, 210)
 
+    @ram_patch(writes=dict.fromkeys(range(77, 87), 145))
     def all_blue_cars(self):
         """
         Colors all cars blue.
         """
-        for car in range(77, 87):
-            self.env.set_ram(car, 145)
 
     #### My modifications
 
+    @ram_patch(writes=dict.fromkeys(range(77, 87), 6))
     def invisible_mode(self):
         """
         Colors all cars invisible.
         """
-        for car in range(77, 87):
-            self.env.set_ram(car, 6)
 
     def strobo_mode(self):
         """
         Each car changes color randomly every timestep.
         """
-        for car in range(77, 87):
-            color = random.randint(0, 255)
+        colors = self.env.modif_rng.randints(0, 255, 10)
+        for car, color in zip(range(77, 87), colors):
             self.env.set_ram(car, color)
 
     clock_counter = 0
@@ -113,9 +104,9 @@ class GameModifications:
         """
         Each car changes color randomly approximately every second.
         """
-        for car in range(77, 87):
-            if self.clock_counter % 30 == 0:
-                rand_number = random.randint(1, 8)
+        if self.clock_counter % 30 == 0:
+            rand_numbers = self.env.modif_rng.randints(1, 8, 10)
+            for car, rand_number in zip(range(77, 87), rand_numbers):
                 self.env.set_ram(car, self._color_map[rand_number])
         self.clock_counter = self.clock_counter + 1
 
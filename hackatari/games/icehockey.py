@@ -1,6 +1,3 @@
-import random
-
-
 class GameModifications:
     """
     Encapsulates game modifications for managing active modifications and applying them.
@@ -20,7 +17,7 @@ class GameModifications:
         """
         Randomly wiggles the ball
         """
-        if random.random() < 0.01 and self.is_wind_blowing == 0:
+        if self.env.modif_rng.random() < 0.01 and self.is_wind_blowing == 0:
             # randomly wind will start to blow
             self.is_wind_blowing = 10
         elif self.is_wind_blowing > 0:
@@ -28,9 +25,9 @@ class GameModifications:
             self.is_wind_blowing = self.is_wind_blowing - 1
             
             # it will change direction randomly
-            if random.random() < 0.1:
+            if self.env.modif_rng.random() < 0.1:
                 self.wind_direction_x = self.wind_direction_x * -1
-            if random.random() < 0.1:
+            if self.env.modif_rng.random() < 0.1:
                 self.wind_direction_y = self.wind_direction_y * -1
 
             ram = self.env.get_ram()
@@ -1,4 +1,3 @@
-import random
 import numpy as np
 
 
@@ -65,7 +64,7 @@ class GameModifications:
         """
         Randomizes the floor on which the player starts.
         """
-        random_number = random.randint(0, 1)
+        random_number = self.env.modif_rng.randint(0, 1)
         if random_number == 0:
             self.set_kangaroo_position_floor1()
         else:
@@ -1,6 +1,3 @@
-import random
-
-
 class GameModifications:
     """
     Encapsulates game modifications for managing active modifications and applying them.
@@ -53,7 +50,7 @@ class GameModifications:
         Randomizes which items are found in which rooms.
         """
         randomized = self.ITEM_ROOMS.copy()
-        random.shuffle(randomized)
+        self.env.modif_rng.shuffle(randomized)
 
     def full_inventory(self):
         """
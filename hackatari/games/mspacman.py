@@ -1,6 +1,3 @@
-import random
-
-
 class GameModifications:
     """
     Encapsulates game modifications for managing active modifications and applying them.
@@ -77,6 +74,12 @@ class GameModifications:
             self.env.set_ram(i, 0)
         self.env.set_ram(117, 0)
 
+    def reset_end_game(self):
+        """
+        Draws the pill kept by the endgame at the start of an episode.
+        """
+        self.end_game_pills = self.env.modif_rng.randint(59, 101)
+
 
 #### My modifications        
 
@@ -279,7 +282,6 @@ class GameModifications:
             elif mod == "set_level_2":
                 self.active_modifications.add("set_level_2")
             elif mod == "end_game":
-                self.end_game_pills = random.randint(59, 101)
                 self.active_modifications.add("end_game")
             elif mod == "slow_ghosts":
                 self.active_modifications.add("slow_ghosts")
@@ -340,6 +342,8 @@ class GameModifications:
         step_modifs = [modif_mapping[name]
                        for name in self.active_modifications if name in modif_mapping]
         reset_modifs = []
+        if "end_game" in self.active_modifications:
+            reset_modifs.append(self.reset_end_game)
         post_detection_modifs = []
         return step_modifs, reset_modifs, post_detection_modifs
 
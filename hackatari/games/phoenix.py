@@ -1,6 +1,3 @@
-import random
-
-
 # Warning: Doesn't work right now.
 
 
@@ -58,7 +55,7 @@ class GameModifications:
         randomly wind blows to player ship
         """
 
-        if random.random() < 0.01 and self.is_wind_blowing == 0:
+        if self.env.modif_rng.random() < 0.01 and self.is_wind_blowing == 0:
             # randomly wind will start to blow
             self.is_wind_blowing = 10
         elif self.is_wind_blowing > 0:
@@ -66,7 +63,7 @@ class GameModifications:
             self.is_wind_blowing = self.is_wind_blowing - 1
             
             # it will change direction randomly
-            if random.random() < 0.1:
+            if self.env.modif_rng.random() < 0.1:
                 self.wind_direction_x = self.wind_direction_x * -1
 
             ram = self.env.get_ram()
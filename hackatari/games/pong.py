@@ -1,5 +1,3 @@
-import random
-
 class GameModifications():
     """
     Encapsulates game modifications for managing active modifications and applying them.
@@ -155,10 +153,10 @@ class GameModifications():
         The ball jumps to a random position in the middle of the field every 200 timesteps.
         """
         if not self.timer % 200:
-            rand_number = random.randint(70, 135)
+            rand_number = self.env.modif_rng.randint(70, 135)
             self.env.set_ram(54, rand_number)
         if not self.timer % 200:
-            rand_number = random.randint(70, 135)
+            rand_number = self.env.modif_rng.randint(70, 135)
             self.env.set_ram(49, rand_number)
         self.timer += 1
 
@@ -171,7 +169,7 @@ class GameModifications():
             self.env.set_ram(21, 10) 
             self.env.set_ram(49, 130) 
         if not self.timer % 200:
-            rand_number = random.randint(38, 203)
+            rand_number = self.env.modif_rng.randint(38, 203)
             self.env.set_ram(21, rand_number)  
         self.timer += 1
 
@@ -1,4 +1,4 @@
-import random
+from hackatari.ram_patches import ram_patch
 
 
 class GameModifications:
@@ -14,7 +14,7 @@ class GameModifications:
         """
         self.env = env
         self.active_modifications = set()
-        self.current_colors = [random.randint(0, 200) for _ in range(4)]
+        self.current_colors = [0] * 4
         self.timer = 0
 
     def gravity(self):
@@ -26,13 +26,12 @@ class GameModifications:
             self.env.set_ram(97, ram[97] + 1)
         self.timer += 1
 
+    @ram_patch(writes={**dict.fromkeys(range(36, 40), 0),  # disables underwater enemies
+                       60: 0})  # disables surface enemies
     def disable_enemies(self):
         """
         Disables all the enemies.
         """
-        for x in range(4):  # disables underwater enemies
-            self.env.set_ram(36 + x, 0)
-        self.env.set_ram(60, 0)  # disables surface enemies
 
     def is_gamestart(self):
         """
@@ -42,15 +41,19 @@ class GameModifications:
         ram = self.env.get_ram()
         return ram[97] == 13 and ram[70] == 76 and ram[26] == 80
 
+    @ram_patch(writes={102: 63}, when=[(97, ">", 13)])  # when not surfacing
+    @ram_patch(writes={59: 3},  # replace life if lost because of bug
+               when=[(97, "==", 13), (70, "==", 76), (26, "==", 80)])  # game start
     def unlimited_oxygen(self):
         """
         Changes the behavior of the oxygen bar to remain filled.
         """
-        ram = self.env.get_ram()
-        if ram[97] > 13:  # when not surfacing
-            self.env.set_ram(102, 63)
-        if self.is_gamestart():
-            self.env.set_ram(59, 3)  # replace life if lost because of bug
+
+    def reset_enemy_colors(self):
+        """
+        Draws the colors of the enemies at the start of an episode.
+        """
+        self.current_colors = self.env.modif_rng.randints(0, 200, 4)
 
     def random_color_enemies(self):
         """
@@ -59,7 +62,7 @@ class GameModifications:
         ram = self.env.get_ram()
         for i in range(4):
             if ram[30 + i] == 200:  # if the enemy is not in frame
-                self.current_colors[i] = random.randint(0, 255)
+                self.current_colors[i] = self.env.modif_rng.randint(0, 255)
             self.env.set_ram(44 + i, self.current_colors[i])
 
     def _set_active_modifications(self, active_modifs):
@@ -82,6 +85,8 @@ class GameModifications:
         step_modifs = [modif_mapping[name]
                        for name in self.active_modifications if name in modif_mapping]
         reset_modifs = []
+        if "random_color_enemies" in self.active_modifications:
+            reset_modifs.append(self.reset_enemy_colors)
         post_detection_modifs = []
         return step_modifs, reset_modifs, post_detection_modifs
 
@@ -1,4 +1,5 @@
 import numpy as np
+from hackatari.ram_patches import ram_patch
 
 
 class GameModifications:
@@ -13,44 +14,41 @@ class GameModifications:
         self.env = env
         self.active_modifications = set()
 
+    @ram_patch(writes=dict.fromkeys(range(43, 52), 0))
     def disable_shield_left(self):
         """
         Disables the left shield.
         """
-        for i in range(43, 52):
-            self.env.set_ram(i, 0)
 
+    @ram_patch(writes=dict.fromkeys(range(52, 61), 0))
     def disable_shield_middle(self):
         """
         Disables the middle shield.
         """
-        for i in range(52, 61):
-            self.env.set_ram(i, 0)
 
+    @ram_patch(writes=dict.fromkeys(range(61, 71), 0))
     def disable_shield_right(self):
         """
         Disables the right shield.
         """
-        for i in range(61, 71):
-            self.env.set_ram(i, 0)
 
+    @ram_patch(writes={27: 35})
     def relocate_shields_slight_left(self):
         """
         Relocates the shields to a low position.
         """
-        self.env.set_ram(27, 35)
 
+    @ram_patch(writes={27: 44})
     def relocate_shields_off_by_one(self):
         """
         Relocates the shields to a medium position.
         """
-        self.env.set_ram(27, 44)
 
+    @ram_patch(writes={27: 53})
     def relocate_shields_right(self):
         """
         Relocates the shields to a high position.
         """
-        self.env.set_ram(27, 53)
 
     def controlable_missile(self):
         """
@@ -95,41 +93,38 @@ class GameModifications:
             self.env.set_ram(22, 33)
         self.timer += 1
 
+    @ram_patch(writes={16: 0, 26: 40})
     def frozen_aliens(self):
         """
         The aliens always stay at the same position.
         """
-        self.env.set_ram(16, 0)
-        self.env.set_ram(26, 40)
 
+    @ram_patch(writes={30: 70})
     def frozen_satellite(self):
         """
         The satellite always stays at the same position.
         """
-        self.env.set_ram(30, 70)
         # Notice: The P1 and P2 score displays aren't visible permanantly.
 
+    @ram_patch(writes=dict.fromkeys(range(43, 71), 0))
     def no_shields(self):
         """
         All shields are disabled.
         """
-        self.disable_shield_left()
-        self.disable_shield_middle()
-        self.disable_shield_right()
 
+    @ram_patch(writes={71: 112})
     def blue_background(self):
         """
         Sets background color to blue.
         """
-        self.env.set_ram(71, 112)
         # Notice: For some reason the player is not possible to shoot rockets anymore,
         # if you change this ram position.
 
+    @ram_patch(writes={73: 3})
     def immortal(self):
         """
         Sets lifes always to 3. The player can't die.
         """
-        self.env.set_ram(73, 3)
 
     def machine_gun(self):
         """
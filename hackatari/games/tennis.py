@@ -1,6 +1,3 @@
-import random
-
-
 class GameModifications:
     """
     Encapsulates game modifications for managing active modifications and applying them.
@@ -26,7 +23,7 @@ class GameModifications:
         new_ball_x = ball_x
         new_ball_y = ball_y
         new_shadow_y = shadow_y
-        if random.randint(0, 1) < 0.5:
+        if self.env.modif_rng.randint(0, 1) < 0.5:
             new_ball_x += 1
             new_ball_y += 1
             new_shadow_y += 1
@@ -1,6 +1,3 @@
-import random
-
-
 class GameModifications:
     """
     Encapsulates game modifications for managing active modifications and applying them.
@@ -76,14 +73,14 @@ class GameModifications:
         if self.room != ram[90]:
             self.room = ram[90]
             for i in range(6):
-                self.enemy_random_colors[i] = random.choice(self.COLORS)
+                self.enemy_random_colors[i] = self.env.modif_rng.choice(self.COLORS)
 
     def reset_random_colors(self):
         """
         Resets the enemy colors to new random values.
         """
         for i in range(6):
-            self.enemy_random_colors[i] = random.choice(self.COLORS)
+            self.enemy_random_colors[i] = self.env.modif_rng.choice(self.COLORS)
 
     def _set_active_modifications(self, active_modifs):
         """
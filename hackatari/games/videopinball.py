@@ -1,6 +1,3 @@
-import random
-
-
 # Warning: Doesn't work right now.
 
 
@@ -29,8 +26,8 @@ class GameModifications:
         # "if 10 < ram[67] < 145:" to prevent teleportations at the left/right tubes
         # randomly teleports the ball to one of these locations
         if 10 < ram[67] < 145:
-            if random.random() < 0.001:
-                p = random.random()
+            if self.env.modif_rng.random() < 0.001:
+                p = self.env.modif_rng.random()
 
                 if p < 1/7:
                     self.env.set_ram(67, 140)
@@ -0,0 +1,198 @@
+"""
+Streaming metrics of evaluation runs.
+
+The episodes of an evaluation are added one at a time, as they finish or as they are read from a
+log, and only their totals are kept: the summaries cost O(total steps) and never need the whole
+log in memory. Aggregators of different workers are combined with ``merge``.
+"""
+import numpy as np
+
+
+class RunningStats:
+    """
+    Count, mean, population variance, min and max of a stream of values (Welford's algorithm).
+    """
+
+    __slots__ = ("count", "mean", "m2", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        """
+        Adds a value to the statistics.
+        """
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        """
+        Adds the values of another ``RunningStats`` (Chan et al. parallel update).
+        """
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def var(self):
+        return self.m2 / self.count if self.count else float("nan")
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.var))
+
+
+def _total(values):
+    """
+    Sum of the values of a step column (a list from a json log or an array from a binary log).
+    """
+    if isinstance(values, np.ndarray):
+        return values.sum().item()
+    return sum(values)
+
+
+class AgentMetrics:
+    """
+    Metrics of the episodes of one agent: episode reward, time and length statistics, action
+    counts, and the totals of every episode.
+    """
+
+    def __init__(self):
+        self.rewards = RunningStats()
+        self.times = RunningStats()
+        self.steps = RunningStats()
+        self.action_counts = np.zeros(0, dtype=np.int64)
+        self.episodes = []
+
+    def add_episode(self, episode_data):
+        """
+        Adds an episode, in the log format of the evaluator.
+
+        :return: Dictionary with the reward, time, steps and action counts of the episode
+        """
+        actions = episode_data["current_episodes_actions"]
+        counts = np.bincount(np.asarray(actions, dtype=np.int64).ravel())
+        if len(counts) > len(self.action_counts):
+            self.action_counts = np.pad(self.action_counts, (0, len(counts) - len(self.action_counts)))
+        self.action_counts[:len(counts)] += counts
+        summary = {
+            "reward": _total(episode_data["current_episodes_rewards"]),
+            "time": _total(episode_data["current_episodes_times"]),
+            "steps": len(episode_data["current_episodes_times"]),
+            "actions": {action: int(count) for action, count in enumerate(counts) if count},
+        }
+        self.rewards.add(summary["reward"])
+        self.times.add(summary["time"])
+        self.steps.add(summary["steps"])
+        self.episodes.append(summary)
+        return summary
+
+    def merge(self, other):
+        """
+        Adds the episodes of another ``AgentMetrics``.
+        """
+        self.rewards.merge(other.rewards)
+        self.times.merge(other.times)
+        self.steps.merge(other.steps)
+        size = max(len(self.action_counts), len(other.action_counts))
+        self.action_counts = np.pad(self.action_counts, (0, size - len(self.action_counts))) \
+            + np.pad(other.action_counts, (0, size - len(other.action_counts)))
+        self.episodes.extend(other.episodes)
+        return self
+
+
+class EvaluationMetrics:
+    """
+    Metrics of an evaluation run, per agent in the order the agents first appear.
+    """
+
+    def __init__(self):
+        self.agents = {}
+
+    def add_episode(self, episode_data):
+        """
+        Adds an episode to the metrics of its agent (``episode_data["agent_path"]``).
+
+        :return: The summary of the episode, see ``AgentMetrics.add_episode``
+        """
+        agent_path = episode_data["agent_path"]
+        if agent_path not in self.agents:
+            self.agents[agent_path] = AgentMetrics()
+        return self.agents[agent_path].add_episode(episode_data)
+
+    def merge(self, other):
+        """
+        Adds the episodes of another ``EvaluationMetrics``, e.g. the one of another worker.
+        """
+        for agent_path, metrics in other.agents.items():
+            self.agents.setdefault(agent_path, AgentMetrics()).merge(metrics)
+        return self
+
+    def overall(self):
+        """
+        Metrics of all the episodes of all the agents.
+        """
+        total = AgentMetrics()
+        for metrics in self.agents.values():
+            total.merge(metrics)
+        return total
+
+
+def print_metrics(metrics, episodes):
+    """
+    Prints the per episode, per agent and overall metrics of an evaluation.
+
+    :param metrics: ``EvaluationMetrics`` of the evaluation
+    :param episodes: Number of episodes each agent was evaluated on
+    """
+    for agent_path, agent_metrics in metrics.agents.items():
+        print(f"Loaded agent from {agent_path}")
+        for episode, summary in enumerate(agent_metrics.episodes):
+            print(f"Episode {episode + 1}: Reward = {summary['reward']}, Time = {summary['time']:.2f} seconds with {summary['steps']} steps and actions: {summary['actions']}")
+
+        rewards, times, steps = agent_metrics.rewards, agent_metrics.times, agent_metrics.steps
+        print("\nSummary:")
+        print(f"Agent: {agent_path}")
+        print(f"Total Episodes: {episodes}")
+
+        print(f"Average Reward: {rewards.mean:.2f}")
+        print(f"Reward Standard Deviation: {rewards.std:.2f}")
+        print(f"Min Reward: {rewards.min}")
+        print(f"Max Reward: {rewards.max}")
+
+        print(f"Average Time: {times.mean:.2f} seconds")
+        print(f"Time Standard Deviation: {times.std:.2f} seconds")
+        print(f"Min Time: {times.min:.2f} seconds")
+        print(f"Max Time: {times.max:.2f} seconds")
+
+        print(f"Average Step: {steps.mean:.2f} steps")
+        print(f"Step Standard Deviation: {steps.std:.2f} steps")
+        print(f"Min Step: {steps.min} steps")
+        print(f"Max Step: {steps.max} steps")
+
+        print("--------------------------------------")
+
+    overall = metrics.overall()
+    print("------------------------------------------------")
+    print(f"Overall Average Reward: {overall.rewards.mean:.2f}, Time: {overall.times.mean:.2f} seconds and {overall.steps.mean:.2f} steps")
+    print(f"Overall Reward Standard Deviation: {overall.rewards.std:.2f}, Time Standard Deviation: {overall.times.std:.2f} seconds, Step Standard Deviation: {overall.steps.std:.2f}")
+    print("------------------------------------------------")
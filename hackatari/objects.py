@@ -0,0 +1,124 @@
+"""
+Struct-of-arrays view of the objects of a HackAtari environment.
+
+OCAtari keeps the objects of a game in a list of fixed length, where every category owns the same
+slots in every step (e.g. slot 0 is always the player) and empty slots hold a ``NoObject``.
+``ObjectArrays`` mirrors this list into preallocated numpy arrays, one entry per slot: the category
+id of the slot, its visibility and the ``x``, ``y``, ``w``, ``h``, ``dx`` and ``dy`` of its object.
+Rewards and modifications can then select and combine objects with array operations instead of
+walking the list and testing every object.
+
+The view of an environment is ``env.object_arrays``. It is refreshed in place the first time it is
+accessed after a step or a reset, so environments whose view is never used do not pay for it.
+"""
+import struct
+from itertools import chain
+
+import numpy as np
+
+
+class ObjectArrays:
+    """
+    The objects of an environment, as arrays with one entry per object slot.
+
+    ``category`` holds the category id of every slot (the index of its name in ``categories``, -1
+    until an object was seen in the slot). A slot keeps the category of its last object while it is
+    empty, so the slots of a category are the same in every step. ``visible`` is False for the empty slots and the
+    invisible objects, whose values are the ones of the ``NoObject`` (or invisible object) in the
+    slot. ``x``, ``y``, ``w``, ``h``, ``dx`` and ``dy`` are int32 arrays. All the arrays are updated
+    in place and can be kept between steps.
+    """
+
+    FIELDS = ("x", "y", "w", "h", "dx", "dy")
+
+    def __init__(self, env):
+        """
+        :param env: The HackAtari environment whose objects are viewed
+        """
+        self.env = env
+        self.categories = []
+        self._category_ids = {}
+        # Object class -> category id, -1 for the classes of empty slots
+        self._class_ids = {}
+        self._allocate(len(env.objects))
+
+    def _allocate(self, num_slots):
+        self.num_slots = num_slots
+        # Packs the x, y, w, h, previous x and y, class id and visibility of every slot
+        self._pack = struct.Struct(f"<{num_slots * 8}i").pack
+        self.category = np.full(num_slots, -1, dtype=np.int16)
+        self.visible = np.zeros(num_slots, dtype=bool)
+        self._values = np.zeros((num_slots, len(self.FIELDS)), dtype=np.int32)
+        for i, field in enumerate(self.FIELDS):
+            setattr(self, field, self._values[:, i])
+
+    def __len__(self):
+        return self.num_slots
+
+    def category_id(self, category):
+        """
+        Returns the id of a category name, registering it if it was never seen.
+        """
+        category_id = self._category_ids.get(category)
+        if category_id is None:
+            category_id = self._category_ids[category] = len(self.categories)
+            self.categories.append(category)
+        return category_id
+
+    def update(self):
+        """
+        Copies the current objects of the environment into the arrays.
+        """
+        objects = self.env.objects
+        if len(objects) != self.num_slots:
+            # The list of objects changed its length, the slots are laid out again
+            self._allocate(len(objects))
+        class_ids = self._class_ids
+        for obj in objects:
+            if obj.__class__ not in class_ids:
+                category = obj.category
+                class_ids[obj.__class__] = -1 if category == "NoObject" else self.category_id(category)
+        # One pass over the objects, reading the attributes behind x, y, w, h, dx and dy
+        rows = [obj._xy + obj.wh + (obj._prev_xy or obj._xy) + (class_ids[obj.__class__], bool(obj))
+                for obj in objects]
+        try:
+            raw = np.frombuffer(self._pack(*chain.from_iterable(rows)), dtype=np.int32)
+        except struct.error:
+            # Non-integer coordinates
+            raw = np.array(rows, dtype=np.float64).astype(np.int32)
+        raw = raw.reshape(self.num_slots, 8)
+        values = self._values
+        values[:, :4] = raw[:, :4]
+        np.subtract(raw[:, :2], raw[:, 4:6], out=values[:, 4:])
+        np.not_equal(raw[:, 7], 0, out=self.visible)
+        np.copyto(self.category, raw[:, 6], where=raw[:, 6] >= 0)
+
+    def mask(self, category):
+        """
+        Boolean mask of the slots holding a visible object of the given category.
+        """
+        category_id = self._category_ids.get(category)
+        if category_id is None:
+            return np.zeros(self.num_slots, dtype=bool)
+        return (self.category == category_id) & self.visible
+
+    def slots(self, category):
+        """
+        Indices of the slots holding a visible object of the given category.
+        """
+        return np.flatnonzero(self.mask(category))
+
+    def first(self, category):
+        """
+        Index of the first slot holding a visible object of the given category, None if there is
+        no such object.
+        """
+        slots = self.slots(category)
+        return int(slots[0]) if len(slots) else None
+
+    def names(self):
+        """
+        The category name of every slot, "NoObject" for the empty slots and invisible objects.
+        """
+        names = np.array(self.categories + ["NoObject"])
+        return names[np.where(self.visible, self.category, len(self.categories))]
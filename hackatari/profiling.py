@@ -0,0 +1,119 @@
+"""
+Per-phase timing of HackAtari environments.
+
+With ``HackAtari(..., profile=True)``, the callables of every phase of ``step`` and ``reset`` are
+wrapped on the environment instance by ``PhaseProfiler.timed``, which measures each call with
+``perf_counter_ns`` and counts it in a fixed-size histogram of power-of-two buckets. Recording a
+call is one clock read and two integer additions; without ``profile`` nothing is wrapped and the
+environment runs exactly the same code as before.
+
+The phases are ``step`` and ``reset`` (whole calls), ``step_modifications`` (RAM patches and step
+modifications of a sub-step), ``emulation`` (emulator sub-steps), ``object_detection``,
+``buffers`` (observation stacks), ``pooling`` (dopamine pooling), ``post_detection_modifications``
+and ``reward`` (custom reward function). Every modification function is also timed on its own,
+as ``step:<name>``, ``reset:<name>`` and ``post_detection:<name>``.
+"""
+import time
+
+
+# Number of histogram buckets: bucket b counts the calls that took [2**(b-1), 2**b) ns
+BUCKETS = 64
+
+
+class PhaseProfiler:
+    """
+    Histograms of the call durations of named phases.
+    """
+
+    def __init__(self):
+        # Phase name -> [histogram (list of BUCKETS counts), total ns]
+        self.phases = {}
+
+    def _phase(self, name):
+        if name not in self.phases:
+            self.phases[name] = [[0] * BUCKETS, 0]
+        return self.phases[name]
+
+    def timed(self, name, func):
+        """
+        Returns a wrapper of ``func`` that records the duration of every call under ``name``.
+        """
+        phase = self._phase(name)
+        histogram = phase[0]
+        perf_counter_ns = time.perf_counter_ns
+
+        def wrapper(*args, **kwargs):
+            start = perf_counter_ns()
+            result = func(*args, **kwargs)
+            elapsed = perf_counter_ns() - start
+            histogram[min(elapsed.bit_length(), BUCKETS - 1)] += 1
+            phase[1] += elapsed
+            return result
+
+        wrapper.__wrapped__ = func
+        wrapper.__name__ = getattr(func, "__name__", name)
+        return wrapper
+
+    def clear(self):
+        """
+        Resets all the counters, keeping the wrapped functions recording.
+        """
+        for phase in self.phases.values():
+            phase[0][:] = [0] * BUCKETS
+            phase[1] = 0
+
+    def merge(self, other):
+        """
+        Adds the counters of another profiler, e.g. the one of another environment.
+        """
+        for name, (histogram, total) in other.phases.items():
+            phase = self._phase(name)
+            phase[0][:] = [a + b for a, b in zip(phase[0], histogram)]
+            phase[1] += total
+        return self
+
+    @staticmethod
+    def _quantile(histogram, calls, q):
+        """
+        Upper bound (in ns) of the bucket holding the q-quantile.
+        """
+        target = q * calls
+        seen = 0
+        for bucket, count in enumerate(histogram):
+            seen += count
+            if count and seen >= target:
+                return 2 ** bucket
+        return 0
+
+    def summary(self):
+        """
+        Returns the statistics of every phase that was called, slowest total first.
+
+        :return: List of dictionaries with the phase, its number of calls, its total time in ms,
+            its mean time in µs and the upper bounds of its median and 99th percentile in µs
+        """
+        rows = []
+        for name, (histogram, total) in self.phases.items():
+            calls = sum(histogram)
+            if not calls:
+                continue
+            rows.append({
+                "phase": name,
+                "calls": calls,
+                "total_ms": total / 1e6,
+                "mean_us": total / calls / 1e3,
+                "p50_us": self._quantile(histogram, calls, 0.5) / 1e3,
+                "p99_us": self._quantile(histogram, calls, 0.99) / 1e3,
+            })
+        return sorted(rows, key=lambda row: -row["total_ms"])
+
+    def report(self):
+        """
+        Returns the summary as a table.
+        """
+        from tabulate import tabulate
+
+        return tabulate([[r["phase"], r["calls"], f"{r['total_ms']:.1f}", f"{r['mean_us']:.1f}",
+                          f"<{r['p50_us']:.1f}", f"<{r['p99_us']:.1f}"] for r in self.summary()],
+                        headers=["Phase", "Calls", "Total (ms)", "Mean (µs)", "p50 (µs)",
+                                 "p99 (µs)"])
@@ -0,0 +1,184 @@
+import functools
+import operator
+import numpy as np
+
+
+# Comparison operators usable in the guards of a RamPatch
+_GUARD_OPS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "&": lambda value, mask: value & mask != 0,  # any of the mask bits set
+    "!&": lambda value, mask: value & mask == 0,  # none of the mask bits set
+}
+
+
+class RamPatch:
+    """
+    Declarative description of a modification that only writes to the RAM.
+
+    A patch consists of constant writes (``{address: value}``), masked writes
+    (``{address: (mask, value)}``, only the bits in ``mask`` are replaced by the ones of ``value``)
+    and an optional guard: a list of ``(address, op, value)`` conditions on the current RAM that all
+    have to hold for the patch to be applied. ``op`` is one of ``==, !=, <, <=, >, >=``, ``&``
+    (any bit of ``value`` set) or ``!&`` (no bit of ``value`` set).
+    """
+
+    def __init__(self, writes=None, masked=None, when=None):
+        """
+        :param writes: Dictionary mapping RAM addresses to the values written there
+        :param masked: Dictionary mapping RAM addresses to (mask, value) tuples
+        :param when: List of (address, op, value) conditions guarding the writes
+        """
+        self.writes = {int(a): int(v) & 0xFF for a, v in (writes or {}).items()}
+        self.masked = {int(a): (int(m) & 0xFF, int(v) & 0xFF)
+                       for a, (m, v) in (masked or {}).items()}
+        self.when = []
+        for address, op, value in (when or []):
+            if op not in _GUARD_OPS:
+                raise ValueError(f"Unknown guard operator '{op}', use one of {list(_GUARD_OPS)}")
+            self.when.append((int(address), op, int(value)))
+
+    def __repr__(self):
+        return f"RamPatch(writes={self.writes}, masked={self.masked}, when={self.when})"
+
+    @property
+    def needs_ram(self):
+        """
+        Whether applying the patch requires reading the RAM.
+        """
+        return bool(self.masked or self.when)
+
+    def holds(self, ram):
+        """
+        Returns True if all the guard conditions hold on the given RAM.
+        """
+        return all(_GUARD_OPS[op](int(ram[address]), value) for address, op, value in self.when)
+
+    def apply(self, env):
+        """
+        Applies the patch on an environment, one ``set_ram`` call per write.
+        """
+        ram = env.get_ram() if self.needs_ram else None
+        if self.when and not self.holds(ram):
+            return
+        for address, value in self.writes.items():
+            env.set_ram(address, value)
+        for address, (mask, value) in self.masked.items():
+            env.set_ram(address, (int(ram[address]) & ~mask | value & mask) & 0xFF)
+
+
+def ram_patch(*patches, writes=None, masked=None, when=None):
+    """
+    Decorator declaring a modification as one or more RAM patches.
+
+    The decorated method only provides the name and the docstring of the modification, its body is
+    replaced by the application of the patches. HackAtari compiles the patches of all active
+    modifications once (see ``compile_ram_patches``), instead of calling them one by one.
+    Patches can be given as ``RamPatch`` objects or with the keyword arguments of ``RamPatch``;
+    stacked decorators add up.
+    """
+    patches = list(patches)
+    if writes or masked or when:
+        patches.append(RamPatch(writes, masked, when))
+
+    def decorator(func):
+        all_patches = getattr(func, "ram_patches", []) + patches
+
+        @functools.wraps(func)
+        def modification(self):
+            for patch in all_patches:
+                patch.apply(self.env)
+
+        modification.ram_patches = all_patches
+        return modification
+
+    return decorator
+
+
+class CompiledRamPatches:
+    """
+    The RAM patches of all active modifications, merged into flat arrays of writes.
+
+    Unguarded constant writes are merged into one table (later patches win on shared addresses),
+    which is applied in one vectorized write on the RAM snapshot of the sub-step.
+    """
+
+    def __init__(self, patches):
+        writes = {}
+        self._masked = []
+        self._guarded = []
+        for patch in patches:
+            if patch.when:
+                self._guarded.append((
+                    [(address, _GUARD_OPS[op], value) for address, op, value in patch.when],
+                    list(patch.writes.items()),
+                    [(a, ~m & 0xFF, v & m) for a, (m, v) in patch.masked.items()],
+                ))
+            else:
+                writes.update(patch.writes)
+                self._masked.extend((a, ~m & 0xFF, v & m)
+                                    for a, (m, v) in patch.masked.items())
+        self._writes = list(writes.items())
+        self._addresses = np.fromiter(writes.keys(), dtype=np.intp, count=len(writes))
+        self._values = np.fromiter(writes.values(), dtype=np.uint8, count=len(writes))
+
+    def __bool__(self):
+        return bool(self._writes or self._masked or self._guarded)
+
+    @property
+    def needs_ram(self):
+        """
+        Whether applying the plan requires reading the RAM.
+        """
+        return bool(self._masked or self._guarded)
+
+    def write(self, ale):
+        """
+        Writes the constant patches directly on the given ALE interface.
+        Only valid if the plan does not need to read the RAM.
+        """
+        set_ram = ale.setRAM
+        for address, value in self._writes:
+            set_ram(address, value)
+
+    def apply(self, ram, dirty):
+        """
+        Applies all the patches on a RAM snapshot and marks the written addresses in ``dirty``.
+
+        :param ram: RAM snapshot (uint8 array of 128 bytes), modified in place
+        :param dirty: Boolean mask of the addresses that have to be written back to the emulator
+        """
+        ram[self._addresses] = self._values
+        dirty[self._addresses] = True
+        for address, keep, bits in self._masked:
+            ram[address] = ram[address] & keep | bits
+            dirty[address] = True
+        for guards, writes, masked in self._guarded:
+            if all(op(int(ram[address]), value) for address, op, value in guards):
+                for address, value in writes:
+                    ram[address] = value
+                    dirty[address] = True
+                for address, keep, bits in masked:
+                    ram[address] = ram[address] & keep | bits
+                    dirty[address] = True
+
+
+def compile_ram_patches(modifications):
+    """
+    Splits a list of modifications into a compiled plan of RAM patches and the remaining callables.
+
+    :param modifications: List of modification functions
+    :return: Tuple of the CompiledRamPatches and the list of modifications that are no RAM patches
+    """
+    patches, callables = [], []
+    for func in modifications:
+        func_patches = getattr(func, "ram_patches", None)
+        if func_patches:
+            patches.extend(func_patches)
+        else:
+            callables.append(func)
+    return CompiledRamPatches(patches), callables
@@ -0,0 +1,418 @@
+"""
+Registry of the modifications available for every game.
+
+For every game module in ``hackatari/games``, the registry maps each modification name to the
+phases it runs in (``step``, ``reset``, ``post_detection``), its docstring and the RAM addresses it
+writes (``ram``). The addresses are derived from the RAM patches of the modification and a static
+scan of its ``set_ram`` calls; ``ram_complete`` is False when some written address could not be
+resolved statically, in which case ``ram`` also holds the addresses seen while running it and may be
+incomplete. It is built once by introspecting the game modules and cached on disk, keyed by the
+size and modification time of the game files, so later lookups read a small json file and do
+not import any game module.
+"""
+import ast
+import hashlib
+import importlib
+import inspect
+import json
+import operator
+import os
+import random
+import textwrap
+
+from hackatari.rng import ModificationRNG
+
+
+GAMES_DIR = os.path.join(os.path.dirname(__file__), "games")
+PHASES = ("step", "reset", "post_detection")
+
+_registry = None
+
+
+def _game_files():
+    return sorted(f for f in os.listdir(GAMES_DIR) if f.endswith(".py") and not f.startswith("_"))
+
+
+def _fingerprint():
+    """
+    Hash of the name, size and modification time of the game files.
+    """
+    digest = hashlib.sha1()
+    for filename in _game_files():
+        stat = os.stat(os.path.join(GAMES_DIR, filename))
+        digest.update(f"{filename}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:16]
+
+
+def cache_path():
+    """
+    Path of the cached registry, in ``$HACKATARI_CACHE_DIR`` or the user cache directory.
+    """
+    cache_dir = os.environ.get("HACKATARI_CACHE_DIR") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+        "hackatari")
+    return os.path.join(cache_dir, f"registry-{_fingerprint()}.json")
+
+
+def _modification_names(path):
+    """
+    Extracts the candidate modification names of a game module from its source: the string keys
+    of the mappings of ``_fill_modif_lists``, the names it tests with ``in
+    self.active_modifications``, and the names ``_set_active_modifications`` compares the requested
+    modifications with (names it translates into other ones, e.g. MsPacman ``caged_ghosts``). A
+    candidate is only registered if activating it gives modification functions.
+    """
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    names = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.FunctionDef) and node.name == "_fill_modif_lists":
+            for child in ast.walk(node):
+                if isinstance(child, ast.Dict):
+                    keys = [k.value for k in child.keys
+                            if isinstance(k, ast.Constant) and isinstance(k.value, str)]
+                elif isinstance(child, ast.Compare) and isinstance(child.left, ast.Constant) \
+                        and isinstance(child.ops[0], ast.In) \
+                        and getattr(child.comparators[0], "attr", None) == "active_modifications":
+                    keys = [child.left.value]
+                else:
+                    continue
+                names.extend(k for k in keys if k not in names)
+        elif isinstance(node, ast.FunctionDef) and node.name == "_set_active_modifications":
+            for child in ast.walk(node):
+                if isinstance(child, ast.Compare) and isinstance(child.ops[0], ast.Eq):
+                    for operand in (child.left, *child.comparators):
+                        if isinstance(operand, ast.Constant) and isinstance(operand.value, str) \
+                                and operand.value not in names:
+                            names.append(operand.value)
+    return names
+
+
+def _doc(handler, func):
+    """
+    Docstring of a modification function. Lambdas (e.g. ``lambda: self.set_level(0)``) get the
+    docstring of the handler method they call.
+    """
+    if func.__doc__:
+        return inspect.cleandoc(func.__doc__)
+    if getattr(func, "__name__", "") == "<lambda>":
+        for name in func.__code__.co_names:
+            method = getattr(handler, name, None)
+            if callable(method) and method.__doc__:
+                return inspect.cleandoc(method.__doc__)
+    return ""
+
+
+class _RecordingEnv:
+    """
+    Stand-in for a HackAtari environment that records the RAM addresses written by modifications.
+    """
+
+    def __init__(self, fill):
+        self.ram = [fill] * 128
+        self.written = set()
+        self.modif_rng = ModificationRNG(0)
+
+    def get_ram(self):
+        return list(self.ram)
+
+    def set_ram(self, address, value):
+        self.written.add(int(address))
+
+    def _get_action(self):
+        return 0
+
+
+_OPERATORS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul}
+
+
+class _AddressScan:
+    """
+    Static scan of the RAM addresses a modification function writes with ``set_ram``, following
+    the calls to other methods of the handler. An address is resolved when it is a constant, a
+    variable of a ``for`` loop over a constant ``range``/sequence, a ``randint`` with constant
+    bounds, a variable assigned one of those, or a sum, difference or product of those. The
+    conditions are not evaluated, so the addresses of all the branches are counted. ``complete`` is
+    False as soon as a written address cannot be resolved.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.addresses = set()
+        self.complete = True
+        self._scanned = set()
+
+    def scan_function(self, func):
+        func = getattr(func, "__func__", func)
+        if getattr(func, "__name__", "") == "<lambda>":
+            # The lambdas of the mappings call a method of the handler
+            for name in func.__code__.co_names:
+                if callable(getattr(self.handler, name, None)):
+                    self.scan_function(getattr(self.handler, name))
+            return
+        func = inspect.unwrap(func)
+        if func in self._scanned:
+            return
+        self._scanned.add(func)
+        try:
+            tree = ast.parse(textwrap.dedent(inspect.getsource(func)))
+        except (OSError, TypeError, SyntaxError):
+            self.complete = False
+            return
+        self._scan(tree.body[0].body, {})
+
+    def _scan(self, nodes, loops):
+        """
+        :param loops: Variable -> set of its possible values (None if unknown), updated by the
+            assignments
+        """
+        for node in nodes:
+            if isinstance(node, ast.Assign) and len(node.targets) == 1 \
+                    and isinstance(node.targets[0], ast.Name):
+                # The variable can hold the values of any of its assignments (branches are not
+                # evaluated)
+                name, values = node.targets[0].id, self._values(node.value, loops)
+                if name in loops:
+                    values = None if values is None or loops[name] is None \
+                        else values | loops[name]
+                loops[name] = values
+            if isinstance(node, ast.For):
+                self._scan(node.body, {**loops, **self._loop_bindings(node, loops)})
+                self._scan(node.orelse, loops)
+                continue
+            for child in ast.iter_child_nodes(node):
+                if isinstance(child, ast.stmt):
+                    self._scan([child], loops)
+                else:
+                    for expression in ast.walk(child):
+                        self._scan_call(expression, loops)
+
+    def _scan_call(self, node, loops):
+        if not isinstance(node, ast.Call) or not isinstance(node.func, ast.Attribute):
+            return
+        if node.func.attr == "set_ram":
+            values = self._values(node.args[0], loops) if node.args else None
+            if values is None:
+                self.complete = False
+            else:
+                self.addresses.update(values)
+        elif isinstance(node.func.value, ast.Name) and node.func.value.id == "self":
+            method = getattr(self.handler, node.func.attr, None)
+            if callable(method):
+                self.scan_function(method)
+
+    def _loop_bindings(self, node, loops):
+        """
+        Values taken by the variables of a ``for`` loop, None for the unknown ones.
+        """
+        if not isinstance(node.target, ast.Tuple):
+            targets, values = [node.target], [self._iterated(node.iter, loops)]
+        else:
+            targets = node.target.elts
+            function = getattr(node.iter, "func", None) if isinstance(node.iter, ast.Call) else None
+            name = getattr(function, "id", None)
+            if name == "zip":
+                # for a, b in zip(x, y): a iterates over x and b over y
+                values = [self._iterated(arg, loops) for arg in node.iter.args]
+            elif name == "enumerate" and len(node.iter.args) == 1:
+                # for i, x in enumerate(y): i iterates over the indices of y and x over y
+                elements = self._sequence(node.iter.args[0], loops)
+                values = [set(range(len(elements))) if elements is not None else None,
+                          self._iterated(node.iter.args[0], loops)]
+            else:
+                values = []
+        bindings = {}
+        for i, target in enumerate(targets):
+            if isinstance(target, ast.Name):
+                bindings[target.id] = values[i] if len(values) == len(targets) else None
+        return bindings
+
+    def _sequence(self, node, loops):
+        """
+        Elements of a constant sequence (a literal list or tuple, or a sequence attribute of the
+        handler), each as its set of possible values; None if unknown.
+        """
+        if isinstance(node, (ast.List, ast.Tuple)):
+            return [self._values(element, loops) for element in node.elts]
+        if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) \
+                and node.value.id == "self":
+            value = getattr(self.handler, node.attr, None)
+            if isinstance(value, (list, tuple)):
+                return [{v} if isinstance(v, int) else None for v in value]
+        return None
+
+    def _iterated(self, node, loops):
+        elements = self._sequence(node, loops)
+        if elements is not None:
+            if any(element is None for element in elements):
+                return None
+            return set().union(*elements)
+        if isinstance(node, ast.Call) and getattr(node.func, "id", None) == "range" \
+                and not node.keywords:
+            bounds = [self._values(arg, loops) for arg in node.args]
+            if all(b is not None and len(b) == 1 for b in bounds):
+                return set(range(*(min(b) for b in bounds)))
+        return None
+
+    def _values(self, node, loops):
+        """
+        Possible values of an address expression, None if it cannot be resolved.
+        """
+        if isinstance(node, ast.Constant) and isinstance(node.value, int):
+            return {node.value}
+        if isinstance(node, ast.Name):
+            return loops.get(node.id)
+        if isinstance(node, ast.BinOp) and type(node.op) in _OPERATORS:
+            left, right = self._values(node.left, loops), self._values(node.right, loops)
+            if left is None or right is None:
+                return None
+            apply = _OPERATORS[type(node.op)]
+            return {apply(a, b) for a in left for b in right}
+        if isinstance(node, ast.Call) and getattr(node.func, "attr", None) == "randint" \
+                and len(node.args) == 2:
+            # randint(a, b) of the random generator of the modifications
+            bounds = [self._values(arg, loops) for arg in node.args]
+            if all(b is not None and len(b) == 1 for b in bounds):
+                return set(range(min(bounds[0]), max(bounds[1]) + 1))
+        return None
+
+
+def _ram_addresses(module, name, funcs):
+    """
+    RAM addresses written by the functions of a modification: the addresses of their RAM patches
+    and of their ``set_ram`` calls (see ``_AddressScan``), checked against the writes recorded by
+    running them on environments whose RAM is all zeros and all ones.
+
+    :return: Tuple of the sorted addresses and whether they are known to be complete
+    """
+    addresses = set()
+    handler = module.GameModifications(_RecordingEnv(0))
+    scan = _AddressScan(handler)
+    for func in funcs:
+        for patch in getattr(func, "ram_patches", []):
+            addresses.update(patch.writes)
+            addresses.update(patch.masked)
+        scan.scan_function(func)
+    addresses.update(scan.addresses)
+    complete = scan.complete
+    for fill in (0, 255):
+        env = _RecordingEnv(fill)
+        try:
+            handler = module.GameModifications(env)
+            handler._set_active_modifications([name])
+            lists = handler._fill_modif_lists()
+            for func in (f for modif_list in lists for f in modif_list):
+                if not hasattr(func, "ram_patches"):
+                    func()
+        except Exception:
+            # The run stopped early, the writes it did not reach are only known from the scan
+            pass
+        if not env.written <= addresses:
+            complete = False  # writes the scan did not see
+            addresses.update(env.written)
+    return sorted(addresses), complete
+
+
+def _describe_game(module, path):
+    """
+    Registry entries of one game module.
+    """
+    modifications = {}
+    for name in _modification_names(path):
+        try:
+            handler = module.GameModifications(_RecordingEnv(0))
+            handler._set_active_modifications([name])
+            lists = handler._fill_modif_lists()
+        except Exception:
+            continue  # the modification cannot be activated
+        phases = [phase for phase, modif_list in zip(PHASES, lists) if modif_list]
+        if not phases:
+            continue
+        funcs = [f for modif_list in lists for f in modif_list]
+        doc = next((doc for doc in (_doc(handler, f) for f in funcs) if doc), "")
+        ram, ram_complete = _ram_addresses(module, name, funcs)
+        modifications[name] = {
+            "phases": phases,
+            "doc": doc,
+            "ram": ram,
+            "ram_complete": ram_complete,
+        }
+    return modifications
+
+
+def build_registry():
+    """
+    Builds the registry by importing and introspecting every game module.
+
+    :return: Dictionary game module name -> modification name -> {"phases", "doc", "ram",
+        "ram_complete"}
+    """
+    registry = {}
+    random_state = random.getstate()
+    try:
+        for filename in _game_files():
+            game = filename[:-3]
+            module = importlib.import_module(f"hackatari.games.{game}")
+            if not hasattr(module, "GameModifications"):
+                continue
+            registry[game] = _describe_game(module, os.path.join(GAMES_DIR, filename))
+    finally:
+        random.setstate(random_state)
+    return registry
+
+
+def load_registry(rebuild=False):
+    """
+    Returns the registry, read from the disk cache or built (and cached) if needed.
+    """
+    global _registry
+    if _registry is not None and not rebuild:
+        return _registry
+    path = cache_path()
+    if not rebuild and os.path.exists(path):
+        with open(path) as f:
+            _registry = json.load(f)
+        return _registry
+    _registry = build_registry()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(_registry, f, indent=1)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass  # read-only cache directory, the registry is rebuilt by the next process
+    return _registry
+
+
+def game_modifications(game_name):
+    """
+    Returns the registry entries of a game (empty if the game has no modifications).
+    """
+    return load_registry().get(game_name.lower(), {})
+
+
+def modification_names(game_name):
+    """
+    Returns the names of the modifications available for a game.
+    """
+    return list(game_modifications(game_name))
+
+
+def unknown_modifications(game_name, modifs):
+    """
+    Returns the modifications of ``modifs`` that do not exist for the given game.
+    """
+    available = game_modifications(game_name)
+    return [modif for modif in modifs if modif not in available]
+
+
+def describe(game_name):
+    """
+    Human readable list of the modifications of a game and their descriptions.
+    """
+    retstr = f"Available modifications for {game_name}:\n"
+    for name, entry in game_modifications(game_name).items():
+        retstr += f"  * {name}:\n\t"
+        retstr += entry["doc"].replace("\n", "\n\t") + "\n"
+    return retstr
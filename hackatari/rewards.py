@@ -0,0 +1,213 @@
+import copy
+import importlib.util
+import itertools
+import sys
+import numpy as np
+from hackatari.objects import ObjectArrays
+
+
+# Types of the module-level values that make up the state of a reward module
+_STATE_TYPES = (bool, int, float, str, list, dict, tuple, set, np.ndarray, np.generic, type(None))
+
+
+class RewardBatch:
+    """
+    The state of several environments stacked into arrays, as given to a batched reward function.
+
+    A batched reward function is defined in a reward module as
+    ``batched_reward_function(batch) -> np.ndarray`` and returns one reward per environment of the
+    batch. The arrays are built lazily on first access and have one row per environment:
+    ``ram`` is ``(N, 128)``, ``objects(attribute)`` is ``(N, S)`` with one column per object slot.
+    The object arrays are stacked from the ``object_arrays`` view of every environment.
+    ``indices`` holds the lane index of every row inside its vector environment, which lets stateful
+    batched rewards keep their state in arrays indexed by lane.
+    """
+
+    def __init__(self, envs, indices=None):
+        """
+        :param envs: List of HackAtari environments of the same game
+        :param indices: Lane index of every environment, 0..N-1 if None
+        """
+        self.envs = list(envs)
+        self.size = len(self.envs)
+        self.indices = np.arange(self.size) if indices is None else np.asarray(indices)
+        self._cache = {}
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def ram(self):
+        """
+        The RAM of every environment, as a ``(N, 128)`` uint8 array.
+        """
+        if "ram" not in self._cache:
+            self._cache["ram"] = np.stack([env.get_ram() for env in self.envs])
+        return self._cache["ram"]
+
+    @property
+    def org_reward(self):
+        """
+        The reward of the game for the last step of every environment.
+        """
+        if "org_reward" not in self._cache:
+            self._cache["org_reward"] = np.array(
+                [env.org_reward for env in self.envs], dtype=np.float64)
+        return self._cache["org_reward"]
+
+    @property
+    def categories(self):
+        """
+        The category of the object in every slot, as a ``(N, S)`` array of names ("NoObject" for
+        empty slots and invisible objects).
+        """
+        if "categories" not in self._cache:
+            self._cache["categories"] = np.stack([env.object_arrays.names() for env in self.envs])
+        return self._cache["categories"]
+
+    def objects(self, attribute):
+        """
+        The value of an attribute (e.g. "x", "dy") of the object in every slot, as a ``(N, S)``
+        float array. Slots whose object does not have the attribute are 0.
+        """
+        key = ("objects", attribute)
+        if key not in self._cache:
+            if attribute in ObjectArrays.FIELDS:
+                self._cache[key] = np.array(
+                    [getattr(env.object_arrays, attribute) for env in self.envs], dtype=np.float64)
+            else:
+                self._cache[key] = np.array(
+                    [[getattr(obj, attribute, 0) for obj in env.objects] for env in self.envs],
+                    dtype=np.float64)
+        return self._cache[key]
+
+    def mask(self, category):
+        """
+        Boolean ``(N, S)`` mask of the slots holding a visible object of the given category.
+        """
+        key = ("mask", category)
+        if key not in self._cache:
+            self._cache[key] = np.array([env.object_arrays.mask(category) for env in self.envs])
+        return self._cache[key]
+
+    def first(self, category, attribute, default=0):
+        """
+        The attribute of the first object of a category in every environment, as a ``(N,)`` array.
+
+        :param default: Value for the environments without such an object
+        """
+        mask = self.mask(category)
+        values = self.objects(attribute)[np.arange(self.size), mask.argmax(axis=1)]
+        return np.where(mask.any(axis=1), values, default)
+
+
+def load_reward_module(path):
+    """
+    Loads a new instance of a custom reward module from a file.
+
+    Every call executes the file into a fresh module object, so module-level state is never shared
+    between two loads. The module defines ``reward_function(env) -> float``,
+    ``batched_reward_function(batch)`` or both, and optionally the hooks ``reset()`` and
+    ``batched_reset(indices)``, called when an environment (resp. the given lanes) is reset.
+    """
+    name = f"reward_function_{next(_module_ids)}"
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    # Registered only while the file runs (e.g. for dataclasses), so that loads do not pile up
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        sys.modules.pop(name, None)
+    if not (hasattr(module, "reward_function") or hasattr(module, "batched_reward_function")):
+        raise ValueError(
+            f"{path} defines neither reward_function nor batched_reward_function")
+    return module
+
+
+_module_ids = itertools.count()
+
+
+class RewardFunction:
+    """
+    A custom reward of one environment, with its own instance of the reward module.
+
+    Calling it returns the reward of the environment. ``reset`` is called by ``HackAtari.reset`` and
+    resets the state of the reward through the module hooks.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: Path to the reward module
+        """
+        self.path = path
+        self.module = load_reward_module(path)
+        if hasattr(self.module, "reward_function"):
+            self._function = self.module.reward_function
+        else:
+            batched_reward_function = self.module.batched_reward_function
+            self._function = lambda env: float(batched_reward_function(RewardBatch([env]))[0])
+
+    def __call__(self, env):
+        return self._function(env)
+
+    def reset(self):
+        """
+        Reset the state of the reward at the start of an episode.
+        """
+        if hasattr(self.module, "reset"):
+            self.module.reset()
+        elif not hasattr(self.module, "reward_function") and hasattr(self.module, "batched_reset"):
+            self.module.batched_reset(np.arange(1))
+
+    def get_state(self):
+        """
+        Returns a copy of the module-level state (the plain data globals) of the reward.
+        """
+        return {name: copy.deepcopy(value) for name, value in vars(self.module).items()
+                if not name.startswith("__") and isinstance(value, _STATE_TYPES)}
+
+    def set_state(self, state):
+        """
+        Restores a state returned by ``get_state``.
+        """
+        vars(self.module).update(copy.deepcopy(state))
+
+
+class BatchedRewardFunction:
+    """
+    A custom reward of ``num_envs`` lanes, evaluated in one call per step on a ``RewardBatch``.
+
+    A module defining ``batched_reward_function`` is loaded once for all lanes. Otherwise every
+    lane gets its own ``RewardFunction`` and the batch is evaluated in a loop.
+    """
+
+    def __init__(self, path, num_envs):
+        """
+        :param path: Path to the reward module
+        :param num_envs: Number of lanes
+        """
+        self.path = path
+        module = load_reward_module(path)
+        if hasattr(module, "batched_reward_function"):
+            self.module = module
+            self.lanes = None
+        else:
+            self.module = None
+            self.lanes = [RewardFunction(path) for _ in range(num_envs)]
+
+    def __call__(self, batch):
+        if self.lanes is None:
+            return self.module.batched_reward_function(batch)
+        return np.fromiter((self.lanes[i](env) for i, env in zip(batch.indices, batch.envs)),
+                           dtype=np.float64, count=batch.size)
+
+    def reset(self, indices):
+        """
+        Reset the state of the reward for the given lanes.
+        """
+        if self.lanes is not None:
+            for i in indices:
+                self.lanes[i].reset()
+        elif hasattr(self.module, "batched_reset"):
+            self.module.batched_reset(np.asarray(indices))
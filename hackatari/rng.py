@@ -0,0 +1,113 @@
+"""
+Random generator of the stochastic modifications.
+
+Every HackAtari environment owns a ``ModificationRNG`` (``env.modif_rng``), which the stochastic
+modifications draw from instead of the global ``random`` module. It wraps a
+``numpy.random.Generator``, reseeded from the seed given to ``reset(seed=...)``, so two
+environments reset with the same seed draw the same modifications, whatever the other
+environments of the process (or the other lanes of a vectorized environment) do.
+
+The draws follow the ``random`` module (``random``, ``randint``, ``choice``, ``choices``,
+``shuffle``) and are taken from a block of uniform numbers drawn in a single call to the
+generator, which is much cheaper than a call to the generator per number. ``randints`` takes
+several integers from the block at once, e.g. the colors of all the cars of a step.
+"""
+from bisect import bisect
+from itertools import accumulate
+
+import numpy as np
+
+
+class ModificationRNG:
+    """
+    Seeded random generator with the interface of the ``random`` module, drawing its numbers in
+    blocks from a ``numpy.random.Generator``.
+    """
+
+    # Number of uniform numbers drawn at once for the scalar draws
+    BLOCK = 256
+
+    def __init__(self, seed=None):
+        """
+        :param seed: Seed of the generator, None for a seed from the OS entropy
+        """
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        """
+        Restarts the generator from a seed, dropping the numbers left in the current block.
+
+        :param seed: Seed of the generator, None for a seed from the OS entropy
+        """
+        self.generator = np.random.default_rng(seed)
+        self._block = []
+
+    def random(self):
+        """
+        Returns a float in [0, 1).
+        """
+        block = self._block
+        if not block:
+            block.extend(self.generator.random(self.BLOCK).tolist())
+        return block.pop()
+
+    def randint(self, a, b):
+        """
+        Returns an integer in [a, b], both included.
+        """
+        return a + int(self.random() * (b - a + 1))
+
+    def choice(self, seq):
+        """
+        Returns a random element of a non-empty sequence.
+        """
+        return seq[int(self.random() * len(seq))]
+
+    def choices(self, population, weights=None, k=1):
+        """
+        Returns a list of ``k`` elements of the population drawn with replacement, with the
+        given relative weights.
+        """
+        if weights is None:
+            return [self.choice(population) for _ in range(k)]
+        cumulative = list(accumulate(weights))
+        total = cumulative[-1]
+        last = len(cumulative) - 1
+        return [population[bisect(cumulative, self.random() * total, 0, last)]
+                for _ in range(k)]
+
+    def shuffle(self, x):
+        """
+        Shuffles a list in place.
+        """
+        for i in reversed(range(1, len(x))):
+            j = int(self.random() * (i + 1))
+            x[i], x[j] = x[j], x[i]
+
+    def randints(self, a, b, k):
+        """
+        Returns a list of ``k`` integers in [a, b], both included, taken from the block at once.
+        """
+        block = self._block
+        if len(block) < k:
+            # The numbers left in the block are used first
+            block[:0] = self.generator.random(max(self.BLOCK, k)).tolist()
+        start = len(block) - k
+        draws = block[start:]
+        del block[start:]
+        n = b - a + 1
+        return [a + int(u * n) for u in draws]
+
+    def get_state(self):
+        """
+        Returns the state of the generator, including the numbers left in the current block.
+        """
+        return self.generator.bit_generator.state, list(self._block)
+
+    def set_state(self, state):
+        """
+        Restores a state returned by ``get_state``.
+        """
+        bit_generator_state, block = state
+        self.generator.bit_generator.state = bit_generator_state
+        self._block[:] = block
@@ -0,0 +1,494 @@
+import multiprocessing as mp
+import pickle
+import traceback
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+import gymnasium as gym
+from gymnasium.vector.utils import batch_space
+
+from .core import HackAtari
+from .rewards import BatchedRewardFunction, RewardBatch
+
+
+def _obs_layout(env):
+    """
+    Returns the shape and dtype of a single observation of the given environment.
+
+    :param env: A HackAtari environment
+    """
+    shape = env._env.observation_space.shape
+    if env.obs_mode == "obj":
+        return shape, np.float32
+    return shape, np.uint8
+
+
+def _step_lanes(envs, actions, autoreset, observations, rewards, terminations, truncations,
+                reward_function=None):
+    """
+    Steps the given lanes and writes their outputs into the given arrays. Lanes flagged in
+    ``autoreset`` are reset instead, and the flags are updated for the next call.
+
+    :param reward_function: Batched custom reward, evaluated once on all the stepped lanes
+    :return: The list of the infos of the lanes
+    """
+    if reward_function is not None and autoreset.any():
+        reward_function.reset(np.flatnonzero(autoreset))
+    infos = []
+    for i, env in enumerate(envs):
+        if autoreset[i]:
+            obs, info = env.reset()
+            rewards[i] = 0.0
+            terminations[i] = truncations[i] = False
+        else:
+            obs, reward, terminated, truncated, info = env.step(actions[i])
+            rewards[i] = reward
+            terminations[i] = terminated
+            truncations[i] = truncated
+        observations[i] = obs
+        infos.append(info)
+
+    if reward_function is not None:
+        stepped = np.flatnonzero(~autoreset)
+        if len(stepped):
+            lanes = [envs[i] for i in stepped]
+            for i, env in zip(stepped, lanes):
+                env.org_reward = float(rewards[i])
+                env.org_return += env.org_reward
+                infos[i]["org_return"] = env.org_return
+            try:
+                rewards[stepped] = reward_function(RewardBatch(lanes, stepped))
+            except Exception as e:
+                print("Error in new_reward_func: ", e)
+                rewards[stepped] = 0.0
+
+    np.logical_or(terminations, truncations, out=autoreset)
+    return infos
+
+
+class HackAtariVectorEnv(gym.vector.VectorEnv):
+    """
+    Runs several HackAtari environments (lanes) in the current process and batches their outputs.
+
+    Every lane owns its own ALE instance and its own modification handler, built from the same
+    list of modifications, so the step, reset and post-detection modifications are identical on
+    all lanes. Observations, rewards and done flags are written into preallocated ``(num_envs, ...)``
+    arrays. Finished lanes are reset on the following call to ``step`` (the action given for them is
+    ignored), as in the gymnasium vector environments.
+    """
+
+    def __init__(
+        self,
+        env_name: str,
+        num_envs: int,
+        modifs=[],
+        rewardfunc_path=None,
+        dopamine_pooling=False,
+        game_mode=0,
+        difficulty=0,
+        copy=False,
+        *args,
+        **kwargs,
+    ):
+        """
+        Initialize the lanes of the vectorized environment.
+
+        :param env_name: Name of the Atari game environment
+        :param num_envs: Number of environments (lanes)
+        :param modifs: List of modifications applied to every lane
+        :param rewardfunc_path: Path to a custom reward function, evaluated once per step on all the
+                                lanes (see ``hackatari.rewards``)
+        :param dopamine_pooling: Whether to use Dopamine-style frame pooling
+        :param game_mode: Specific mode setting for the ALE
+        :param difficulty: Difficulty level for the ALE
+        :param copy: If True, ``step`` and ``reset`` return a copy of the observation buffer
+                     instead of the buffer itself (which is overwritten by the next call).
+        """
+        self.num_envs = num_envs
+        self.modifs = list(modifs)
+        self.copy = copy
+        self.envs = [
+            HackAtari(env_name, self.modifs, None, dopamine_pooling,
+                      game_mode, difficulty, *args, **kwargs)
+            for _ in range(num_envs)
+        ]
+        self.reward_function = BatchedRewardFunction(
+            rewardfunc_path, num_envs) if rewardfunc_path else None
+        env = self.envs[0]
+        self.game_name = env.game_name
+        self.obs_mode = env.obs_mode
+        self.metadata = env.metadata
+        self.render_mode = env.render_mode
+
+        obs_shape, obs_dtype = _obs_layout(env)
+        self.single_observation_space = gym.spaces.Box(
+            0, 255, obs_shape, dtype=obs_dtype)
+        self.observation_space = batch_space(
+            self.single_observation_space, num_envs)
+        self.single_action_space = env.action_space
+        self.action_space = batch_space(self.single_action_space, num_envs)
+
+        # Preallocated output buffers, reused on every call
+        self._observations = np.zeros(
+            (num_envs,) + obs_shape, dtype=obs_dtype)
+        self._rewards = np.zeros((num_envs,), dtype=np.float64)
+        self._terminations = np.zeros((num_envs,), dtype=np.bool_)
+        self._truncations = np.zeros((num_envs,), dtype=np.bool_)
+        self._autoreset_envs = np.zeros((num_envs,), dtype=np.bool_)
+
+    def reset(self, *, seed=None, options=None):
+        """
+        Reset all lanes.
+
+        :param seed: None, a single seed (lane i is seeded with ``seed + i``) or a list of seeds
+        :param options: Passed to the reset of every lane
+        """
+        if seed is None:
+            seeds = [None] * self.num_envs
+        elif isinstance(seed, int):
+            seeds = [seed + i for i in range(self.num_envs)]
+        else:
+            seeds = list(seed)
+            assert len(seeds) == self.num_envs, \
+                f"Expected {self.num_envs} seeds, got {len(seeds)}"
+
+        infos = {}
+        for i, (env, lane_seed) in enumerate(zip(self.envs, seeds)):
+            obs, info = env.reset(seed=lane_seed, options=options)
+            self._observations[i] = obs
+            infos = self._add_info(infos, info, i)
+        if self.reward_function is not None:
+            self.reward_function.reset(range(self.num_envs))
+
+        self._terminations[:] = False
+        self._truncations[:] = False
+        self._autoreset_envs[:] = False
+        return self._output(self._observations), infos
+
+    def step(self, actions):
+        """
+        Take a step in every lane. Lanes that finished on the previous call are reset instead.
+
+        :param actions: One action per lane
+        """
+        lane_infos = _step_lanes(self.envs, actions, self._autoreset_envs, self._observations,
+                                 self._rewards, self._terminations, self._truncations,
+                                 self.reward_function)
+        infos = {}
+        for i, info in enumerate(lane_infos):
+            infos = self._add_info(infos, info, i)
+        return (self._output(self._observations), self._output(self._rewards),
+                self._output(self._terminations), self._output(self._truncations), infos)
+
+    def _output(self, buffer):
+        return buffer.copy() if self.copy else buffer
+
+    def close_extras(self, **kwargs):
+        """
+        Close every lane.
+        """
+        for env in self.envs:
+            env.close()
+
+
+def _per_worker(value, num_workers, name):
+    """
+    Expands a setting given once for all workers into one value per worker.
+    """
+    if isinstance(value, (list, tuple)):
+        assert len(value) == num_workers, \
+            f"Expected one {name} per worker ({num_workers}), got {len(value)}"
+        return list(value)
+    return [value] * num_workers
+
+
+def _error_reply(e):
+    """
+    Reply of a worker for an exception, raised by the main process with the traceback of the
+    worker instead of waiting for it.
+    """
+    try:
+        pickle.dumps(e)
+    except Exception:
+        e = RuntimeError(f"{type(e).__name__}: {e}")
+    return False, (e, traceback.format_exc())
+
+
+def _process_worker(pipe, parent_pipe, env_name, num_envs, modifs, rewardfunc_path,
+                    dopamine_pooling, game_mode, difficulty, args, kwargs):
+    """
+    Hosts ``num_envs`` HackAtari environments in a worker process and writes their outputs into the
+    shared memory buffers created by the main process.
+    """
+    parent_pipe.close()
+    envs = []
+    try:
+        for _ in range(num_envs):
+            envs.append(HackAtari(env_name, modifs, None, dopamine_pooling,
+                                  game_mode, difficulty, *args, **kwargs))
+        reward_function = BatchedRewardFunction(
+            rewardfunc_path, num_envs) if rewardfunc_path else None
+        obs_shape, obs_dtype = _obs_layout(envs[0])
+    except (Exception, SystemExit) as e:
+        for env in envs:
+            env.close()
+        pipe.send(_error_reply(e))
+        pipe.close()
+        return
+    pipe.send((True, (obs_shape, np.dtype(obs_dtype).str, envs[0].action_space)))
+
+    blocks = []
+    autoreset = np.zeros((num_envs,), dtype=np.bool_)
+    try:
+        while True:
+            command, data = pipe.recv()
+            if command == "close":
+                break
+            try:
+                reply = None
+                if command == "attach":
+                    names, offset, ring_size, total = data
+                    blocks = [shared_memory.SharedMemory(name=name) for name in names]
+                    obs_ring = np.ndarray((ring_size, total) + obs_shape, dtype=obs_dtype,
+                                          buffer=blocks[0].buf)[:, offset:offset + num_envs]
+                    rewards = np.ndarray((total,), dtype=np.float64,
+                                         buffer=blocks[1].buf)[offset:offset + num_envs]
+                    terminations = np.ndarray((total,), dtype=np.bool_,
+                                              buffer=blocks[2].buf)[offset:offset + num_envs]
+                    truncations = np.ndarray((total,), dtype=np.bool_,
+                                             buffer=blocks[3].buf)[offset:offset + num_envs]
+                elif command == "reset":
+                    seeds, options, slot = data
+                    reply = []
+                    for i, env in enumerate(envs):
+                        obs, info = env.reset(seed=seeds[i], options=options)
+                        obs_ring[slot, i] = obs
+                        reply.append(info)
+                        autoreset[i] = False
+                    if reward_function is not None:
+                        reward_function.reset(range(num_envs))
+                    terminations[:] = False
+                    truncations[:] = False
+                elif command == "step":
+                    actions, slot = data
+                    reply = _step_lanes(envs, actions, autoreset, obs_ring[slot], rewards,
+                                        terminations, truncations, reward_function)
+            except (Exception, SystemExit) as e:
+                # The environments are left in an unknown state, so the worker stops
+                pipe.send(_error_reply(e))
+                break
+            pipe.send((True, reply))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for env in envs:
+            env.close()
+        # Views on the shared buffers have to be released before closing them
+        obs_ring = rewards = terminations = truncations = None
+        for block in blocks:
+            block.close()
+        pipe.close()
+
+
+class HackAtariProcessVectorEnv(gym.vector.VectorEnv):
+    """
+    Runs HackAtari environments in worker processes, each worker hosting several environments.
+
+    The workers write observations, rewards and done flags straight into shared memory, so only the
+    actions and the (small) info dictionaries go through the pipes. Observations are kept in a ring
+    of ``ring_size`` slots: the array returned by ``step`` or ``reset`` stays valid for the following
+    ``ring_size - 1`` calls. ``modifs``, ``game_mode`` and ``difficulty`` can be given once for all
+    workers or as a list with one entry per worker, so a single pool can serve a mixed benchmark.
+    Finished environments are reset on the following call to ``step``, as in ``HackAtariVectorEnv``.
+    """
+
+    def __init__(
+        self,
+        env_name: str,
+        num_workers: int,
+        envs_per_worker=1,
+        modifs=[],
+        rewardfunc_path=None,
+        dopamine_pooling=False,
+        game_mode=0,
+        difficulty=0,
+        ring_size=2,
+        context=None,
+        *args,
+        **kwargs,
+    ):
+        """
+        Start the workers and allocate the shared buffers.
+
+        :param env_name: Name of the Atari game environment
+        :param num_workers: Number of worker processes
+        :param envs_per_worker: Number of environments hosted by each worker
+        :param modifs: List of modifications, or one list of modifications per worker
+        :param rewardfunc_path: Path to a custom reward function, evaluated once per step on the
+                                environments of each worker (see ``hackatari.rewards``)
+        :param dopamine_pooling: Whether to use Dopamine-style frame pooling
+        :param game_mode: ALE mode, or one mode per worker
+        :param difficulty: ALE difficulty, or one difficulty per worker
+        :param ring_size: Number of observation slots in the shared ring buffer
+        :param context: Multiprocessing start method (e.g. "spawn"), default of the platform if None
+        """
+        if modifs and all(isinstance(m, (list, tuple)) for m in modifs):
+            worker_modifs = _per_worker(modifs, num_workers, "modifs")
+        else:
+            worker_modifs = [list(modifs)] * num_workers
+        worker_modes = _per_worker(game_mode, num_workers, "game_mode")
+        worker_difficulties = _per_worker(difficulty, num_workers, "difficulty")
+
+        self.num_workers = num_workers
+        self.envs_per_worker = envs_per_worker
+        self.num_envs = num_workers * envs_per_worker
+        self.ring_size = ring_size
+        self.metadata = {"render_modes": []}
+        self.render_mode = None
+        self._blocks = []
+        self._slot = 0
+
+        # Started before the workers so that they share it, otherwise each worker would track
+        # (and unlink at exit) the shared blocks it attaches to
+        resource_tracker.ensure_running()
+        ctx = mp.get_context(context)
+        self._pipes, self._processes = [], []
+        for index in range(num_workers):
+            parent_pipe, child_pipe = ctx.Pipe()
+            process = ctx.Process(
+                target=_process_worker,
+                name=f"HackAtariWorker-{index}",
+                args=(child_pipe, parent_pipe, env_name, envs_per_worker,
+                      worker_modifs[index], rewardfunc_path, dopamine_pooling,
+                      worker_modes[index], worker_difficulties[index], args, kwargs),
+                daemon=True,
+            )
+            process.start()
+            child_pipe.close()
+            self._pipes.append(parent_pipe)
+            self._processes.append(process)
+
+        layouts = self._receive("Creating the environments")
+        obs_shape, obs_dtype, action_space = layouts[0]
+        if any(layout[:2] != (obs_shape, obs_dtype) for layout in layouts):
+            raise ValueError(
+                "All workers have to produce observations of the same shape and dtype")
+        obs_dtype = np.dtype(obs_dtype)
+
+        self.single_observation_space = gym.spaces.Box(
+            0, 255, obs_shape, dtype=obs_dtype)
+        self.observation_space = batch_space(
+            self.single_observation_space, self.num_envs)
+        self.single_action_space = action_space
+        self.action_space = batch_space(action_space, self.num_envs)
+
+        n = self.num_envs
+        sizes = [ring_size * n * int(np.prod(obs_shape)) * obs_dtype.itemsize,
+                 n * np.dtype(np.float64).itemsize, n, n]
+        self._blocks = [shared_memory.SharedMemory(create=True, size=size)
+                        for size in sizes]
+        self._obs_ring = np.ndarray((ring_size, n) + obs_shape, dtype=obs_dtype,
+                                    buffer=self._blocks[0].buf)
+        self._rewards = np.ndarray((n,), dtype=np.float64,
+                                   buffer=self._blocks[1].buf)
+        self._terminations = np.ndarray((n,), dtype=np.bool_,
+                                        buffer=self._blocks[2].buf)
+        self._truncations = np.ndarray((n,), dtype=np.bool_,
+                                       buffer=self._blocks[3].buf)
+
+        names = [block.name for block in self._blocks]
+        for index, pipe in enumerate(self._pipes):
+            pipe.send(("attach", (names, index * envs_per_worker, ring_size, n)))
+        self._receive("Attaching the shared buffers")
+
+    def reset(self, *, seed=None, options=None):
+        """
+        Reset all environments.
+
+        :param seed: None, a single seed (environment i is seeded with ``seed + i``) or a list of seeds
+        :param options: Passed to the reset of every environment
+        """
+        if seed is None:
+            seeds = [None] * self.num_envs
+        elif isinstance(seed, int):
+            seeds = [seed + i for i in range(self.num_envs)]
+        else:
+            seeds = list(seed)
+            assert len(seeds) == self.num_envs, \
+                f"Expected {self.num_envs} seeds, got {len(seeds)}"
+
+        slot = self._next_slot()
+        k = self.envs_per_worker
+        for index, pipe in enumerate(self._pipes):
+            pipe.send(("reset", (seeds[index * k:(index + 1) * k], options, slot)))
+        infos = self._gather_infos("Resetting the environments")
+        return self._obs_ring[slot], infos
+
+    def step(self, actions):
+        """
+        Take a step in every environment. Environments that finished on the previous call are reset instead.
+
+        :param actions: One action per environment
+        """
+        slot = self._next_slot()
+        k = self.envs_per_worker
+        for index, pipe in enumerate(self._pipes):
+            pipe.send(("step", (actions[index * k:(index + 1) * k], slot)))
+        infos = self._gather_infos("Stepping the environments")
+        return (self._obs_ring[slot], self._rewards.copy(), self._terminations.copy(),
+                self._truncations.copy(), infos)
+
+    def _next_slot(self):
+        slot = self._slot
+        self._slot = (slot + 1) % self.ring_size
+        return slot
+
+    def _receive(self, action):
+        """
+        Returns the replies of all the workers to a command. If a worker failed, the pool is closed
+        and the error of the first failed worker is raised with its traceback.
+
+        :param action: What the command does, for the error message
+        """
+        replies, failures = [], []
+        for index, pipe in enumerate(self._pipes):
+            try:
+                ok, reply = pipe.recv()
+            except EOFError:
+                ok, reply = False, (RuntimeError(f"Worker {index} exited without replying"), "")
+            if ok:
+                replies.append(reply)
+            else:
+                failures.append((index, *reply))
+        if failures:
+            self.close()
+            index, error, worker_traceback = failures[0]
+            raise error from RuntimeError(
+                f"{action} in worker {index} failed:\n{worker_traceback}")
+        return replies
+
+    def _gather_infos(self, action):
+        infos = {}
+        for index, worker_infos in enumerate(self._receive(action)):
+            for j, info in enumerate(worker_infos):
+                infos = self._add_info(
+                    infos, info, index * self.envs_per_worker + j)
+        return infos
+
+    def close_extras(self, **kwargs):
+        """
+        Stop the workers and release the shared memory.
+        """
+        for pipe in self._pipes:
+            try:
+                pipe.send(("close", None))
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._processes:
+            process.join()
+        for pipe in self._pipes:
+            pipe.close()
+        self._obs_ring = self._rewards = self._terminations = self._truncations = None
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
@@ -13,6 +13,7 @@ import shutil
 import argparse
 from typing import Literal
 from utils import HackAtariArgumentParser
+from hackatari.metrics import EvaluationMetrics, print_metrics as print_evaluation_metrics
 
 # Disable graphics window (SDL) for headless execution
 os.environ["SDL_VIDEODRIVER"] = "dummy"
@@ -86,98 +87,20 @@ def combine_means_and_stds(mu_list, sigma_list, n_list):
     return combined_mean, combined_std
 
 def print_metrics(episode_data, args_episodes):
-    """prints metrics from a log file's content
+    """prints metrics from a log file's content, in one pass over the episodes
 
     Args:
-        episode_data (dict): episode values
+        episode_data (iterable | EvaluationMetrics): episode values, or the metrics aggregated while
+            the evaluation ran
         args_episodes (int): number of episodes each evaluation is ran
     """
-    unique_agents = list({episode["agent_path"]: None for episode in episode_data}.keys()) # this preserves the agent path order
-    episode_data_grouped_by_agent = [[episode for episode in episode_data if episode["agent_path"] == agent] for agent in unique_agents]
-
-    all_episodes_avg_rewards = []
-    all_episodes_std_rewards = []
-    all_episodes_avg_times = []
-    all_episodes_std_times = []
-    all_episodes_avg_steps = []
-    all_episodes_std_steps = []
-    total_runs = []
-
-    for unique_agent, agent_group in zip(unique_agents, episode_data_grouped_by_agent):
-        print(f"Loaded agent from {unique_agent}")
-        
-        all_episodes_cumulative_rewards = []
-        all_episodes_cumulative_times = []
-        all_episodes_cumulative_actions = []
-        all_episodes_cumulative_steps = []
-
-        for episode, episode_data in enumerate(agent_group):
-            agent_path = episode_data["agent_path"]
-            current_episodes_rewards = episode_data["current_episodes_rewards"]
-            current_episodes_times = episode_data["current_episodes_times"]
-            current_episodes_actions = episode_data["current_episodes_actions"]
-
-            episodes_cumulative_reward = sum(current_episodes_rewards)            
-            all_episodes_cumulative_rewards.append(episodes_cumulative_reward)
-            
-            episodes_cumulative_time = sum(current_episodes_times)
-            all_episodes_cumulative_times.append(episodes_cumulative_time)
-
-            episodes_cumulative_action = {ac:current_episodes_actions.count(ac) for ac in current_episodes_actions}
-            episodes_cumulative_action = dict(sorted(episodes_cumulative_action.items()))
-            all_episodes_cumulative_actions.append(episodes_cumulative_action)
-
-            episodes_cumulative_step = len(current_episodes_times)
-            all_episodes_cumulative_steps.append(episodes_cumulative_step)
-
-            print(f"Episode {episode + 1}: Reward = {episodes_cumulative_reward}, Time = {episodes_cumulative_time:.2f} seconds with {episodes_cumulative_step} steps and actions: {episodes_cumulative_action}")
-
-        all_episodes_avg_reward = np.mean(all_episodes_cumulative_rewards)
-        all_episodes_std_reward = np.std(all_episodes_cumulative_rewards)
-        all_episodes_avg_rewards.append(all_episodes_avg_reward)
-        all_episodes_std_rewards.append(all_episodes_std_reward)
-
-        all_episodes_avg_time = np.mean(all_episodes_cumulative_times)
-        all_episodes_std_time = np.std(all_episodes_cumulative_times)
-        all_episodes_avg_times.append(all_episodes_avg_time)
-        all_episodes_std_times.append(all_episodes_std_time)
-
-        all_episodes_avg_step = np.mean(all_episodes_cumulative_steps)
-        all_episodes_std_step = np.std(all_episodes_cumulative_steps)
-        all_episodes_avg_steps.append(all_episodes_avg_step)
-        all_episodes_std_steps.append(all_episodes_std_step)
-
-        total_runs.append(args_episodes)
-
-        print("\nSummary:")
-        print(f"Agent: {agent_path}")
-        print(f"Total Episodes: {args_episodes}")
-
-        print(f"Average Reward: {all_episodes_avg_reward:.2f}")
-        print(f"Reward Standard Deviation: {all_episodes_std_reward:.2f}")
-        print(f"Min Reward: {np.min(all_episodes_cumulative_rewards)}")
-        print(f"Max Reward: {np.max(all_episodes_cumulative_rewards)}")
-
-        print(f"Average Time: {all_episodes_avg_time:.2f} seconds")
-        print(f"Time Standard Deviation: {all_episodes_std_time:.2f} seconds")
-        print(f"Min Time: {np.min(all_episodes_cumulative_times):.2f} seconds")
-        print(f"Max Step: {np.max(all_episodes_cumulative_times):.2f} seconds")
-
-        print(f"Average Step: {all_episodes_avg_step:.2f} steps")
-        print(f"Step Standard Deviation: {all_episodes_std_step:.2f} steps")
-        print(f"Min Step: {np.min(all_episodes_cumulative_steps)} steps")
-        print(f"Max Step: {np.max(all_episodes_cumulative_steps)} steps")
-
-        print("--------------------------------------")
-
-    # Compute overall statistics
-    total_avg, total_std = combine_means_and_stds(all_episodes_avg_rewards, all_episodes_std_rewards, total_runs)
-    total_avg_time, total_std_time = combine_means_and_stds(all_episodes_avg_times, all_episodes_std_times, total_runs)
-    total_avg_step, total_std_step = combine_means_and_stds(all_episodes_avg_steps, all_episodes_std_steps, total_runs)
-    print("------------------------------------------------")
-    print(f"Overall Average Reward: {total_avg:.2f}, Time: {total_avg_time:.2f} seconds and {total_avg_step:.2f} steps")
-    print(f"Overall Reward Standard Deviation: {total_std:.2f}, Time Standard Deviation: {total_std_time:.2f} seconds, Step Standard Deviation: {total_std_step:.2f}")
-    print("------------------------------------------------")
+    if isinstance(episode_data, EvaluationMetrics):
+        metrics = episode_data
+    else:
+        metrics = EvaluationMetrics()
+        for episode in episode_data:
+            metrics.add_episode(episode)
+    print_evaluation_metrics(metrics, args_episodes)
 
 def get_log_data(episode_data, data_type: Literal["time", "action", "reward"]):
     """returns wanted measurement type from the log
@@ -276,6 +199,7 @@ def main():
         full_action_space=False,
     )
 
+    metrics = EvaluationMetrics()
     # Iterate through all agent models
     for agent_path in args.agents:
         agent, policy = load_agent(agent_path, env, "cpu")
@@ -308,11 +232,11 @@ def main():
                 "current_episodes_actions": current_episodes_actions
             }
             log_episode_data(log_file, episode_data)
+            metrics.add_episode(episode_data)
 
     env.close()
 
-    episode_data = read_log_data(log_file)
-    print_metrics(episode_data, args.episodes)
+    print_metrics(metrics, args.episodes)
     compress_log_data(log_file, compressed_file)
     os.remove(log_file)
 
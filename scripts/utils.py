@@ -1,6 +1,6 @@
 import argparse
 import sys
-from hackatari.core import _available_modifications
+from hackatari.registry import describe
 
 
 class HackAtariArgumentParser(argparse.ArgumentParser):
@@ -12,7 +12,7 @@ class HackAtariArgumentParser(argparse.ArgumentParser):
             if not '-g' in args or '--game' in args:
                 print("Call the script with a given game to get a list of available modifications.")
             else:
-                print(_available_modifications(args[args.index('-g') + 1]))
+                print(describe(args[args.index('-g') + 1]))
                 print("\n provide -h (or --help) without a game argument for the original help message.")
                 exit(0)
 
@@ -0,0 +1,32 @@
+import numpy as np
+
+from hackatari.core import HackAtari
+
+
+def _objects(env):
+    return [(type(obj).__name__, obj.xywh, obj.dx, obj.dy) if obj else None
+            for obj in env.objects]
+
+
+def test_incremental_extraction_matches_full_extraction():
+    """
+    Skipping the extraction when the bytes read by the last one are unchanged gives the objects
+    of a full extraction.
+    """
+    incremental = HackAtari("Kangaroo", [], mode="ram", render_mode=None,
+                            incremental_extraction=True)
+    full = HackAtari("Kangaroo", [], mode="ram", render_mode=None)
+    assert incremental.detect_objects == incremental._detect_objects_incremental
+    incremental.reset(seed=0)
+    full.reset(seed=0)
+    rng = np.random.default_rng(0)
+    for _ in range(300):
+        action = int(rng.integers(full.action_space.n))
+        _, _, terminated, truncated, _ = incremental.step(action)
+        full.step(action)
+        assert _objects(incremental) == _objects(full)
+        if terminated or truncated:
+            incremental.reset(seed=1)
+            full.reset(seed=1)
+    incremental.close()
+    full.close()
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from hackatari.core import HackAtari
+
+
+def _rollout(env, steps):
+    rams = []
+    for _ in range(steps):
+        env.step(0)
+        rams.append(env.get_ram().copy())
+    return np.array(rams)
+
+
+@pytest.mark.parametrize("modifs", [["drunken_boxing"], ["gravity"]])
+def test_restore_continues_stateful_modifications(modifs):
+    """
+    Modifications keeping a counter between steps continue exactly after restore_full_state.
+    """
+    env = HackAtari("Boxing", modifs, mode="ram", render_mode=None)
+    env.reset(seed=0)
+    _rollout(env, 7)
+    state = env.clone_full_state()
+    original = _rollout(env, 50)
+    env.restore_full_state(state)
+    restored = _rollout(env, 50)
+    env.close()
+    assert np.array_equal(original, restored)
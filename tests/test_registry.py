@@ -0,0 +1,31 @@
+import pytest
+
+from hackatari import registry
+
+
+@pytest.fixture(scope="module")
+def games():
+    return registry.build_registry()
+
+
+@pytest.mark.parametrize("name", ["caged_ghosts", "disable_orange", "disable_red", "disable_cyan",
+                                  "disable_pink"])
+def test_translated_names_are_registered(games, name):
+    """
+    Names that _set_active_modifications translates into other modifications are available.
+    """
+    entry = games["mspacman"][name]
+    assert entry["phases"] and entry["doc"]
+
+
+def test_lambda_modifications_have_a_doc(games):
+    for name in ("set_level_0", "set_level_1", "set_level_2"):
+        assert games["montezumarevenge"][name]["doc"]
+
+
+def test_ram_addresses_include_random_writes(games):
+    """
+    The addresses written by stochastic modifications are all listed, not the ones of one run.
+    """
+    entry = games["freeway"]["stop_random_car"]
+    assert entry["ram"] == list(range(33, 43)) and entry["ram_complete"]
@@ -0,0 +1,17 @@
+from hackatari.core import HackAtari
+
+
+def test_seeded_reset_does_not_depend_on_history():
+    """
+    A seeded reset draws the same modifications as the first reset of a new environment.
+    """
+    env = HackAtari("MsPacman", ["end_game"], mode="ram", render_mode=None)
+    fresh = HackAtari("MsPacman", ["end_game"], mode="ram", render_mode=None)
+    env.reset(seed=1)
+    env.reset(seed=2)
+    env.reset()
+    env.reset(seed=3)
+    fresh.reset(seed=3)
+    assert env._modif_handlers[0].end_game_pills == fresh._modif_handlers[0].end_game_pills
+    env.close()
+    fresh.close()
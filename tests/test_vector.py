@@ -0,0 +1,17 @@
+import pytest
+
+from hackatari.vector import HackAtariProcessVectorEnv
+
+
+def test_worker_step_error_is_raised_with_its_traceback():
+    """
+    An exception raised while stepping in a worker is raised by the main process, with the
+    traceback of the worker, and the pool is closed.
+    """
+    env = HackAtariProcessVectorEnv("Pong", 2, render_mode=None)
+    env.reset(seed=0)
+    with pytest.raises(TypeError) as info:
+        env.step(["not an action", 0])
+    assert "Stepping the environments in worker 0 failed" in str(info.value.__cause__)
+    assert "Traceback" in str(info.value.__cause__)
+    assert env.closed